@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Checks before publishing the data: k-anonymity on the quasi-identifiers
+(country, age, gender, organisation, salary, ...).
+The quasi-identifiers are encoded once into integer codes (the missing values
+being a category of their own). The codes of a combination of columns are
+combined into a single int64 key (mixed radix), and the size of the
+equivalence class of each respondent is given by np.unique() on that key,
+so all the combinations of columns are checked without any groupby on strings.
+The rare combinations can then be generalised (recoding the answers into
+broader categories) or suppressed (the answers replaced by NaN), and checked again.
+"""
+
+import itertools
+import pandas as pd
+import numpy as np
+
+from encoding import encode_df
+
+
+def encode_quasi_identifiers(df, colnames):
+    """
+    Encode the quasi-identifiers, the missing values get the code 0
+
+    :return:
+        codes np.array(): int64 matrix respondents x colnames
+        radix np.array(): number of codes of each column
+    """
+    encoded = encode_df(df, colnames)
+    codes = encoded['codes'].astype(np.int64) + 1
+    radix = np.array([len(cat) + 1 for cat in encoded['categories']], dtype=np.int64)
+    return codes, radix
+
+
+def combined_key(codes, radix, columns):
+    """
+    Single integer per respondent for a combination of columns
+
+    :params:
+        codes np.array(): output of encode_quasi_identifiers()
+        radix np.array(): output of encode_quasi_identifiers()
+        columns list(): position of the columns of the combination
+
+    :return:
+        np.array(): int64 key of each respondent
+    """
+    key = np.zeros(len(codes), dtype=np.int64)
+    n_keys = 1
+    for i in columns:
+        # Renumber the keys before they could overflow
+        if n_keys * radix[i] > 2 ** 62:
+            key = np.unique(key, return_inverse=True)[1].ravel().astype(np.int64)
+            n_keys = len(codes)
+        key = key * radix[i] + codes[:, i]
+        n_keys *= radix[i]
+    return key
+
+
+def class_sizes(codes, radix, columns):
+    """
+    Size of the equivalence class of each respondent for a combination of columns
+
+    :return:
+        sizes np.array(): size of the class of each respondent
+        n_classes int(): number of classes
+    """
+    _, inverse, counts = np.unique(combined_key(codes, radix, columns),
+                                   return_inverse=True, return_counts=True)
+    return counts[inverse.ravel()], len(counts)
+
+
+def check_combinations(df, quasi_identifiers, k=5, max_columns=None):
+    """
+    k-anonymity of all the combinations of quasi-identifiers
+
+    :params:
+        df pd.df(): dataframe containing the data
+        quasi_identifiers list(): the columns
+        k int(): minimum size of the equivalence classes
+        max_columns int(): maximum number of columns in a combination, all if None
+
+    :return:
+        pd.df(): one row per combination with the columns 'columns' (tuple),
+        'n_classes', 'min_size' and 'n_at_risk' (respondents in a class smaller than k),
+        sorted by decreasing number of respondents at risk
+    """
+    codes, radix = encode_quasi_identifiers(df, quasi_identifiers)
+    if max_columns is None:
+        max_columns = len(quasi_identifiers)
+    rows = list()
+    for size in range(1, max_columns + 1):
+        for columns in itertools.combinations(range(len(quasi_identifiers)), size):
+            sizes, n_classes = class_sizes(codes, radix, columns)
+            rows.append((tuple(quasi_identifiers[i] for i in columns), n_classes,
+                         int(sizes.min()) if len(sizes) else 0, int((sizes < k).sum())))
+    report = pd.DataFrame(rows, columns=['columns', 'n_classes', 'min_size', 'n_at_risk'])
+    return report.sort_values('n_at_risk', ascending=False, kind='mergesort').reset_index(drop=True)
+
+
+def at_risk(df, quasi_identifiers, k=5):
+    """
+    Boolean mask of the respondents in an equivalence class smaller than k
+    on the combination of all the quasi-identifiers
+    """
+    codes, radix = encode_quasi_identifiers(df, quasi_identifiers)
+    sizes, _ = class_sizes(codes, radix, range(len(quasi_identifiers)))
+    return pd.Series(sizes < k, index=df.index)
+
+
+def generalise(df, rules):
+    """
+    Recode the quasi-identifiers into broader categories
+
+    :params:
+        df pd.df(): dataframe containing the data
+        rules dict(): column as key and as value either a dictionary
+        {answer: new answer} (the answers not in it are kept) or a function
+        applied to the column
+
+    :return:
+        df pd.df(): a copy of the dataframe with the recoded columns
+    """
+    df = df.copy()
+    for col, rule in rules.items():
+        if callable(rule):
+            df[col] = rule(df[col])
+        else:
+            df[col] = df[col].replace(rule)
+    return df
+
+
+def suppress(df, quasi_identifiers, k=5, to_suppress=None):
+    """
+    Replace by NaN the answers of the respondents at risk
+
+    :params:
+        df pd.df(): dataframe containing the data
+        quasi_identifiers list(): the columns
+        k int(): minimum size of the equivalence classes
+        to_suppress list(): columns set to NaN for the respondents at risk,
+        all the quasi-identifiers if None
+
+    :return:
+        df pd.df(): a copy of the dataframe with the suppressed answers
+        n_suppressed int(): number of respondents suppressed
+    """
+    if to_suppress is None:
+        to_suppress = quasi_identifiers
+    mask = at_risk(df, quasi_identifiers, k)
+    df = df.copy()
+    df.loc[mask, to_suppress] = np.nan
+    return df, int(mask.sum())
+
+
+def release_check(df, quasi_identifiers, k=5, rules=None, to_suppress=None):
+    """
+    Apply the generalisation rules, suppress the respondents still at risk
+    and verify the result
+
+    :params:
+        df pd.df(): dataframe containing the data
+        quasi_identifiers list(): the columns
+        k int(): minimum size of the equivalence classes
+        rules dict(): see generalise()
+        to_suppress list(): see suppress()
+
+    :return:
+        df pd.df(): the dataframe to release
+        report pd.df(): output of check_combinations() on that dataframe
+        n_suppressed int(): number of respondents suppressed
+    """
+    if rules is not None:
+        df = generalise(df, rules)
+    df, n_suppressed = suppress(df, quasi_identifiers, k, to_suppress)
+    report = check_combinations(df, quasi_identifiers, k)
+    return df, report, n_suppressed
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    quasi_identifiers = ['In which country do you work?', 'Please select your age',
+                         'Please select your gender', 'What type of organisation do you work for?',
+                         'Please select the range of your salary']
+    pd.set_option('display.max_colwidth', 200)
+    print(check_combinations(df, quasi_identifiers).head(10))
+    _, report, n_suppressed = release_check(df, quasi_identifiers)
+    print(n_suppressed)
+    print(report.head(5))
+
+
+if __name__ == "__main__":
+    main()
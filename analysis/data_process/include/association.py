@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Association statistics between all the pairs of questions of a survey.
+The answers are encoded into integers (see encoding.py) and, for each question,
+the contingency tables against all the following questions are computed with
+a single np.bincount(). From each table, the chi-square, the Cramér's V and,
+when both questions are ordinal, the Spearman correlation are derived.
+The questions are split between several processes.
+"""
+
+import os
+import concurrent.futures
+import pandas as pd
+import numpy as np
+
+try:
+    from scipy import stats
+except ImportError:  # The p-values are not computed without scipy
+    stats = None
+
+import encoding
+
+
+def contingency_tables(codes, sizes, i, js):
+    """
+    Compute the contingency tables of the column i against the columns js
+    with one bincount
+
+    :params:
+        codes np.array(): matrix respondents x questions of int codes, -1 for missing
+        sizes list(): number of answers of each question
+        i int(): index of the column
+        js list(): indices of the columns to cross with i
+
+    :return:
+        list(): np.array() of shape (sizes[i], sizes[j]) for each j
+    """
+    ci = codes[:, i][:, np.newaxis].astype(np.int64)
+    cj = codes[:, js].astype(np.int64)
+    size_j = np.array([sizes[j] for j in js], dtype=np.int64)
+    table_sizes = sizes[i] * size_j
+    base = np.concatenate([[0], np.cumsum(table_sizes)[:-1]])
+
+    keys = base + ci * size_j + cj
+    valid = (ci >= 0) & (cj >= 0)
+    counts = np.bincount(keys[valid], minlength=int(table_sizes.sum()))
+    return [counts[b:b + t].reshape(sizes[i], s) for b, t, s in zip(base, table_sizes, size_j)]
+
+
+def chi_square(table):
+    """
+    Chi-square statistic of a contingency table, ignoring the
+    answers that nobody gave
+
+    :return:
+        chi2 float(), dof int(), cramers_v float(), n int()
+    """
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    n = table.sum()
+    if n == 0 or min(table.shape) < 2:
+        return np.nan, 0, np.nan, int(n)
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / float(n)
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    dof = (table.shape[0] - 1) * (table.shape[1] - 1)
+    cramers_v = np.sqrt(chi2 / (n * (min(table.shape) - 1)))
+    return chi2, dof, cramers_v, int(n)
+
+
+def _midranks(marginal):
+    """
+    Average rank of each code given how many respondents
+    gave each code (ties get the mean of their ranks)
+    """
+    before = np.cumsum(marginal) - marginal
+    return before + (marginal + 1) / 2.
+
+
+def spearman(table):
+    """
+    Spearman correlation computed from the contingency table of two
+    ordinal questions. The codes have to follow the order of the scale
+
+    :return:
+        float(): the correlation, nan if one of the question is constant
+    """
+    n = table.sum()
+    if n == 0:
+        return np.nan
+    row_marginal = table.sum(axis=1)
+    col_marginal = table.sum(axis=0)
+    rank_row = _midranks(row_marginal) - (n + 1) / 2.
+    rank_col = _midranks(col_marginal) - (n + 1) / 2.
+    cov = rank_row.dot(table).dot(rank_col)
+    var_row = (row_marginal * rank_row ** 2).sum()
+    var_col = (col_marginal * rank_col ** 2).sum()
+    if var_row == 0 or var_col == 0:
+        return np.nan
+    return cov / np.sqrt(var_row * var_col)
+
+
+# Data shared by the worker processes, set once per process by _init_worker()
+_shared = dict()
+
+
+def _init_worker(codes, sizes, ordinal):
+    _shared['codes'] = codes
+    _shared['sizes'] = sizes
+    _shared['ordinal'] = ordinal
+
+
+def _associations_for(i):
+    """
+    Compute the statistics of the column i against all the following
+    columns. Run in the worker processes
+    """
+    codes, sizes, ordinal = _shared['codes'], _shared['sizes'], _shared['ordinal']
+    js = list(range(i + 1, len(sizes)))
+    results = list()
+    if not js:
+        return results
+    for j, table in zip(js, contingency_tables(codes, sizes, i, js)):
+        chi2, dof, cramers_v, n = chi_square(table)
+        rho = spearman(table) if ordinal[i] and ordinal[j] else np.nan
+        results.append((i, j, n, chi2, dof, cramers_v, rho))
+    return results
+
+
+def association_matrix(encoded, ordinal=None, min_answers=2, n_jobs=None):
+    """
+    Compute the association statistics for all the pairs of columns
+
+    :params:
+        encoded dict(): output of encoding.encode_df()
+        ordinal list(): columns whose codes follow an ordered scale (Likert, age,
+        ...), the Spearman correlation is computed between them
+        min_answers int(): columns with less possible answers are skipped
+        n_jobs int(): number of processes, all the cores if None (Default),
+        run in the current process if 1
+
+    :return:
+        pd.df(): one row per pair with the columns 'question_1', 'question_2',
+        'n', 'chi2', 'dof', 'p_value', 'cramers_v' and 'spearman'
+    """
+    if ordinal is None:
+        ordinal = list()
+    keep = [k for k, cat in enumerate(encoded['categories']) if len(cat) >= min_answers]
+    columns = [encoded['columns'][k] for k in keep]
+    codes = encoded['codes'][:, keep]
+    sizes = [len(encoded['categories'][k]) for k in keep]
+    is_ordinal = [col in ordinal for col in columns]
+
+    shared = (codes, sizes, is_ordinal)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs == 1:
+        _init_worker(*shared)
+        results = [_associations_for(i) for i in range(len(columns))]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                                    initargs=shared) as executor:
+            results = list(executor.map(_associations_for, range(len(columns))))
+
+    df = pd.DataFrame([r for res in results for r in res],
+                      columns=['i', 'j', 'n', 'chi2', 'dof', 'cramers_v', 'spearman'])
+    df.insert(0, 'question_1', [columns[i] for i in df['i']])
+    df.insert(1, 'question_2', [columns[j] for j in df['j']])
+    df = df.drop(['i', 'j'], axis=1)
+    if stats is not None:
+        df['p_value'] = stats.chi2.sf(df['chi2'], df['dof'])
+    else:
+        df['p_value'] = np.nan
+    return df
+
+
+def rank_associations(df, by='cramers_v', top=20, min_n=30, max_p_value=None):
+    """
+    Return the strongest associations
+
+    :params:
+        df pd.df(): output of association_matrix()
+        by str(): statistic to rank on ('cramers_v' or 'spearman')
+        top int(): number of pairs to return
+        min_n int(): minimum number of respondents that answered both questions
+        max_p_value float(): only keep the pairs with a p-value below it
+
+    :return:
+        pd.df(): the subset of df sorted by the absolute value of the statistic
+    """
+    df = df.loc[(df['n'] >= min_n) & df[by].notnull()]
+    if max_p_value is not None:
+        df = df.loc[df['p_value'] <= max_p_value]
+    order = df[by].abs().sort_values(ascending=False).index
+    return df.loc[order].head(top)
+
+
+def to_square(df, stat='cramers_v'):
+    """
+    Transform the pairs into a symmetric matrix questions x questions
+    to be plotted as a heatmap
+    """
+    square = df.pivot(index='question_1', columns='question_2', values=stat)
+    questions = list(pd.unique(pd.concat([df['question_1'], df['question_2']])))
+    square = square.reindex(index=questions, columns=questions)
+    return square.combine_first(square.T)
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    colnames = [col for col in df.columns if df[col].nunique() <= 50]
+    encoded = encoding.encode_df(df, colnames)
+    result = association_matrix(encoded)
+    print(rank_associations(result))
+
+
+if __name__ == "__main__":
+    main()
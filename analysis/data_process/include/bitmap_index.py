@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bitmap index over the cleaned data to segment the respondents quickly.
+For each (question, answer) pair, a bitmap with one bit per respondent is stored,
+packed 8 respondents per byte. A segment (such as 'Female in the UK working at
+a university') is built by combining these bitmaps with AND/OR/NOT, and the counts
+of any question within the segment are popcounts of the bitmaps, without
+creating a filtered copy of the dataframe.
+
+The segments are described with nested tuples:
+    ('In which country do you work?', 'United Kingdom')
+    ('In which country do you work?', ['Germany', 'Netherlands'])  # Any of the answers
+    ('AND', segment1, segment2, ...)
+    ('OR', segment1, segment2, ...)
+    ('NOT', segment)
+"""
+
+import pandas as pd
+import numpy as np
+
+import encoding
+
+
+# Number of bits set for each possible byte
+POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+OPERATORS = ('AND', 'OR', 'NOT')
+
+
+def popcount(bitmap):
+    """
+    Count the number of bits set in a packed bitmap
+
+    :params:
+        bitmap np.array(): array of np.uint8
+
+    :return:
+        int(): the number of respondents in the bitmap
+    """
+    return int(POPCOUNT_TABLE[bitmap].sum(dtype=np.int64))
+
+
+def build_index(df, colnames=None, categories=None):
+    """
+    Create the bitmaps for all the answers of the columns
+
+    :params:
+        df pd.df(): dataframe containing the cleaned data
+        colnames list(): columns to index. If None (Default), all the columns
+        categories dict(): colnames as keys and the possible answers as values,
+        see encoding.encode_df()
+
+    :return:
+        dict(): the index, with the keys
+            'n_rows' int(): the number of respondents
+            'all' np.array(): bitmap with all the respondents
+            'bitmaps' dict(): colnames as keys and a dict() {answer: bitmap} as value
+    """
+    encoded = encoding.encode_df(df, colnames, categories)
+    return build_index_from_codes(encoded)
+
+
+def build_index_from_codes(encoded):
+    """
+    Same as build_index() but from an already encoded dataset
+
+    :params:
+        encoded dict(): output of encoding.encode_df()
+
+    :return:
+        dict(): the index, see build_index()
+    """
+    n_rows = encoded['codes'].shape[0]
+    bitmaps = dict()
+    for i, col in enumerate(encoded['columns']):
+        codes = encoded['codes'][:, i]
+        cat = encoded['categories'][i]
+        # One boolean row per answer, packed along the respondents
+        one_hot = codes[np.newaxis, :] == np.arange(len(cat))[:, np.newaxis]
+        packed = np.packbits(one_hot, axis=1)
+        bitmaps[col] = {answer: packed[j] for j, answer in enumerate(cat)}
+
+    return {'n_rows': n_rows,
+            'all': np.packbits(np.ones(n_rows, dtype=bool)),
+            'bitmaps': bitmaps}
+
+
+def empty_bitmap(index):
+    return np.zeros_like(index['all'])
+
+
+def get_bitmap(index, colname, answers):
+    """
+    Return the bitmap of the respondents who gave one of the answers
+    to the question. An unknown answer returns an empty bitmap
+
+    :params:
+        index dict(): output of build_index()
+        colname str(): the question
+        answers str() or list(): one answer or a list of answers
+    """
+    col_bitmaps = index['bitmaps'][colname]
+    if not isinstance(answers, (list, tuple, set)):
+        answers = [answers]
+    result = empty_bitmap(index)
+    for answer in answers:
+        if answer in col_bitmaps:
+            result = result | col_bitmaps[answer]
+    return result
+
+
+def bitmap_and(*bitmaps):
+    result = bitmaps[0]
+    for bitmap in bitmaps[1:]:
+        result = result & bitmap
+    return result
+
+
+def bitmap_or(*bitmaps):
+    result = bitmaps[0]
+    for bitmap in bitmaps[1:]:
+        result = result | bitmap
+    return result
+
+
+def bitmap_not(index, bitmap):
+    # Mask with 'all' to keep the padding bits of the last byte at 0
+    return ~bitmap & index['all']
+
+
+def evaluate(index, segment):
+    """
+    Transform the description of a segment into a bitmap
+
+    :params:
+        index dict(): output of build_index()
+        segment tuple(): description of the segment, see the module docstring.
+        If None, the segment contains all the respondents
+
+    :return:
+        np.array(): the bitmap of the segment
+    """
+    if segment is None:
+        return index['all']
+    operator = segment[0]
+    if operator in OPERATORS:
+        bitmaps = [evaluate(index, s) for s in segment[1:]]
+        if operator == 'AND':
+            return bitmap_and(*bitmaps)
+        elif operator == 'OR':
+            return bitmap_or(*bitmaps)
+        if len(bitmaps) != 1:
+            raise ValueError('NOT takes only one segment, got {}'.format(len(bitmaps)))
+        return bitmap_not(index, bitmaps[0])
+    colname, answers = segment
+    return get_bitmap(index, colname, answers)
+
+
+def segment_size(index, segment):
+    """
+    Number of respondents in the segment
+    """
+    return popcount(evaluate(index, segment))
+
+
+def segment_counts(index, colname, segment=None, normalize=False):
+    """
+    Count the answers of a question within a segment
+
+    :params:
+        index dict(): output of build_index()
+        colname str(): the question to count
+        segment tuple() or np.array(): description of the segment or
+        a bitmap already evaluated. If None, all the respondents
+        normalize bool(): return the ratio of the answered instead of counts
+
+    :return:
+        pd.Series(): the counts indexed by answers
+    """
+    if not isinstance(segment, np.ndarray):
+        segment = evaluate(index, segment)
+    col_bitmaps = index['bitmaps'][colname]
+    counts = pd.Series([popcount(bitmap & segment) for bitmap in col_bitmaps.values()],
+                       index=list(col_bitmaps.keys()), name=colname)
+    if normalize:
+        total = counts.sum()
+        return counts / total if total else counts.astype(float)
+    return counts
+
+
+def segment_freq_table(index, colname, segment=None, add_ratio=False):
+    """
+    Equivalent of plotting.freq_table() on the segment
+
+    :params:
+        index dict(): output of build_index()
+        colname str(): the question to count
+        segment tuple(): description of the segment, see evaluate()
+        add_ratio bool(): add a column 'ratio'
+
+    :return:
+        pd.df(): dataframe with a column 'count' indexed by the answers
+    """
+    counts = segment_counts(index, colname, segment)
+    output = pd.DataFrame({'count': counts})
+    if add_ratio:
+        total = counts.sum()
+        output['ratio'] = counts / total if total else 0.
+    return output
+
+
+def segment_count_unique_value(index, colnames, segment=None, normalize=False):
+    """
+    Equivalent of plotting.count_unique_value() on the segment, for a
+    list of columns that share the same answers
+
+    :params:
+        index dict(): output of build_index()
+        colnames list(): the columns to count
+        segment tuple(): description of the segment, see evaluate()
+        normalize bool(): return ratio instead of counts
+
+    :return:
+        pd.df(): columns as row and the answers as columns
+    """
+    if not isinstance(segment, np.ndarray):
+        segment = evaluate(index, segment)
+    return pd.DataFrame([segment_counts(index, col, segment, normalize) for col in colnames]).fillna(0)
+
+
+def segment_mask(index, segment):
+    """
+    Unpack the bitmap of a segment into a boolean array, to
+    select the rows of the original dataframe if needed
+    """
+    return np.unpackbits(evaluate(index, segment))[:index['n_rows']].astype(bool)
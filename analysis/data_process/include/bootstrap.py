@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bootstrap confidence intervals for the proportions, the Likert means and the
+ranking scores.
+The resamples are drawn once as a matrix of indices resamples x respondents
+and converted into a matrix of counts (how many times each respondent is drawn
+in each resample). The statistic of a question on all the resamples is then
+a matrix product between these counts and the encoded answers, so the same
+resamples are reused for every question and there is no loop over the resamples.
+The questions are split between processes, the matrix of counts being sent
+once to each process by the initializer of the pool (a copy per process,
+not a shared memory).
+The intervals are the percentiles of the bootstrap distribution.
+"""
+
+import os
+import concurrent.futures
+import pandas as pd
+import numpy as np
+
+from encoding import encode_column
+
+
+def resample_indices(n_respondents, n_boot=1000, seed=1):
+    """
+    Draw the bootstrap resamples
+
+    :params:
+        n_respondents int(): number of respondents
+        n_boot int(): number of resamples
+        seed int(): seed of the random generator
+
+    :return:
+        np.array(): matrix n_boot x n_respondents of the respondents drawn
+    """
+    generator = np.random.RandomState(seed)
+    return generator.randint(0, n_respondents, size=(n_boot, n_respondents)).astype(np.int32)
+
+
+def resample_counts(indices, n_respondents=None, weights=None):
+    """
+    Number of times each respondent is drawn in each resample, with one bincount
+
+    :params:
+        indices np.array(): output of resample_indices()
+        n_respondents int(): number of respondents, the width of indices if None
+        weights np.array(): optional weight of each respondent (see weighting.rake()),
+        multiplied to the counts
+
+    :return:
+        np.array(): float matrix n_boot x n_respondents
+    """
+    n_boot = indices.shape[0]
+    if n_respondents is None:
+        n_respondents = indices.shape[1]
+    keys = (np.arange(n_boot, dtype=np.int64)[:, np.newaxis] * n_respondents + indices).ravel()
+    counts = np.bincount(keys, minlength=n_boot * n_respondents).reshape(n_boot, n_respondents)
+    counts = counts.astype(np.float64)
+    if weights is not None:
+        counts *= np.asarray(weights, dtype=float)[np.newaxis, :]
+    return counts
+
+
+def percentile_interval(samples, alpha=0.05):
+    """
+    Lower and upper bounds of the interval, along the first axis (the resamples)
+    """
+    lower, upper = np.nanpercentile(samples, [100 * alpha / 2., 100 * (1 - alpha / 2.)], axis=0)
+    return lower, upper
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return numerator / denominator
+
+
+def bootstrap_ratio(boot_counts, values, valid, weights=None):
+    """
+    Estimate and bootstrap distribution of sum(values) / sum(valid) per column
+
+    :params:
+        boot_counts np.array(): output of resample_counts()
+        values np.array(): matrix respondents x columns, 0 where not valid
+        valid np.array(): boolean matrix respondents x columns
+        weights np.array(): optional weight of each respondent, should be the
+        same as the one given to resample_counts()
+
+    :return:
+        estimate np.array(): the statistic of each column on the whole sample
+        samples np.array(): matrix n_boot x columns
+    """
+    values = values.astype(np.float64)
+    valid = valid.astype(np.float64)
+    w = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    estimate = _ratio(w.dot(values), w.dot(valid))
+    samples = _ratio(boot_counts.dot(values), boot_counts.dot(valid))
+    return estimate, samples
+
+
+def proportion_ci(serie, boot_counts, alpha=0.05, weights=None, categories=None):
+    """
+    Confidence interval of the proportion of each answer of a question,
+    over the respondents who answered it
+
+    :params:
+        serie pd.Series(): the column
+        boot_counts np.array(): output of resample_counts()
+        alpha float(): 1 - confidence level
+        weights np.array(): see bootstrap_ratio()
+        categories list(): the answers, see encoding.encode_column()
+
+    :return:
+        pd.df(): indexed by answer with the columns 'proportion', 'lower' and 'upper'
+    """
+    codes, categories = encode_column(serie, categories)
+    if not categories:
+        # No answer at all, nothing to estimate
+        return pd.DataFrame(columns=['proportion', 'lower', 'upper'],
+                            index=pd.Index([], name=serie.name), dtype=float)
+    answered = codes >= 0
+    # One column per answer, the same denominator for all of them
+    indicator = (codes[:, np.newaxis] == np.arange(len(categories))[np.newaxis, :])
+    estimate, samples = bootstrap_ratio(boot_counts, indicator,
+                                        np.repeat(answered[:, np.newaxis], len(categories), axis=1),
+                                        weights)
+    lower, upper = percentile_interval(samples, alpha)
+    return pd.DataFrame({'proportion': estimate, 'lower': lower, 'upper': upper},
+                        index=pd.Index(categories, name=serie.name))
+
+
+def likert_mean_ci(codes, scores, boot_counts, alpha=0.05, weights=None):
+    """
+    Confidence interval of the mean score of Likert items
+
+    :params:
+        codes np.array(): output of likert.encode_likert()
+        scores np.array(): output of likert.likert_scores()
+        boot_counts np.array(): output of resample_counts()
+        alpha float(): 1 - confidence level
+        weights np.array(): see bootstrap_ratio()
+
+    :return:
+        pd.df(): one row per item with the columns 'mean', 'lower' and 'upper'
+    """
+    valid = codes >= 0
+    values = np.where(valid, np.asarray(scores, dtype=float)[np.maximum(codes, 0)], 0.)
+    estimate, samples = bootstrap_ratio(boot_counts, values, valid, weights)
+    lower, upper = percentile_interval(samples, alpha)
+    return pd.DataFrame({'mean': estimate, 'lower': lower, 'upper': upper})
+
+
+def ranking_ci(ranks, boot_counts, alpha=0.05, weights=None):
+    """
+    Confidence interval of the mean rank and of the share of first places of each option
+
+    :params:
+        ranks np.array(): output of ranking.rank_matrix()
+        boot_counts np.array(): output of resample_counts()
+        alpha float(): 1 - confidence level
+        weights np.array(): see bootstrap_ratio()
+
+    :return:
+        pd.df(): one row per option with the columns 'mean_rank', 'mean_rank_lower',
+        'mean_rank_upper', 'first_share', 'first_share_lower' and 'first_share_upper'
+    """
+    ranked = ranks > 0
+    answered = np.repeat(ranked.any(axis=1)[:, np.newaxis], ranks.shape[1], axis=1)
+    output = dict()
+    for name, values, valid in (('mean_rank', ranks, ranked), ('first_share', ranks == 1, answered)):
+        estimate, samples = bootstrap_ratio(boot_counts, values, valid, weights)
+        lower, upper = percentile_interval(samples, alpha)
+        output[name] = estimate
+        output[name + '_lower'] = lower
+        output[name + '_upper'] = upper
+    return pd.DataFrame(output, columns=['mean_rank', 'mean_rank_lower', 'mean_rank_upper',
+                                         'first_share', 'first_share_lower', 'first_share_upper'])
+
+
+_shared = dict()
+
+
+def _init_worker(boot_counts, alpha, weights):
+    _shared['boot_counts'] = boot_counts
+    _shared['alpha'] = alpha
+    _shared['weights'] = weights
+
+
+def _proportions_for(serie):
+    """
+    Intervals of one question, run in the worker processes
+    """
+    result = proportion_ci(serie, _shared['boot_counts'], _shared['alpha'], _shared['weights'])
+    result.index.name = 'answer'
+    result = result.reset_index()
+    result.insert(0, 'question', serie.name)
+    return result
+
+
+def proportions_report(df, colnames, n_boot=1000, alpha=0.05, weights=None, seed=1, n_jobs=None):
+    """
+    Confidence intervals of the proportions of the answers of many questions,
+    all computed on the same resamples
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the questions
+        n_boot int(): number of resamples
+        alpha float(): 1 - confidence level
+        weights np.array(): optional weight of each respondent
+        seed int(): seed of the resamples
+        n_jobs int(): number of processes, all the cores if None (Default),
+        run in the current process if 1
+
+    :return:
+        pd.df(): with the columns 'question', 'answer', 'proportion', 'lower' and 'upper'
+    """
+    boot_counts = resample_counts(resample_indices(len(df), n_boot, seed), len(df), weights)
+    shared = (boot_counts, alpha, None if weights is None else np.asarray(weights, dtype=float))
+    series = [df[col] for col in colnames]
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs == 1:
+        _init_worker(*shared)
+        results = [_proportions_for(s) for s in series]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                                    initargs=shared) as executor:
+            results = list(executor.map(_proportions_for, series))
+    if not results:
+        return pd.DataFrame(columns=['question', 'answer', 'proportion', 'lower', 'upper'])
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    """
+    """
+    import json
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    with open('../uk_2017/to_plot.json', 'r') as f:
+        type_questions = json.load(f)
+    questions = [q for group in type_questions['single_questions']['yes_no'] for q in group]
+    print(proportions_report(df, questions))
+
+
+if __name__ == "__main__":
+    main()
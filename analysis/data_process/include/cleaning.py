@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import pandas as pd
+import numpy as np
 
 """
 Collection of function to clean the raw data collected from the different survey.
@@ -73,11 +74,102 @@ def merging_others(df, colname, replacement_values=None):
 
 
 
-# Recategorise the answers into 10 categories
+# Declarative bins for the discrete questions. The edges are closed on the left:
+# [1, 4) is '1-3'. The last edge is np.inf to catch all the larger values.
+# 'lower' is the lowest possible answer, the bins are checked to cover it
+BINS = {'software_projects': {'edges': [0, 1, 4, 7, 10, 13, 16, 19, 22, np.inf],
+                              'labels': ['0', '1-3', '4-6', '7-9', '10-12', '13-15',
+                                         '16-18', '19-21', '>=22'],
+                              'lower': 0},
+        'years_experience': {'edges': [0, 2, 5, 10, 15, 20, np.inf],
+                             'labels': ['<2', '2-4', '5-9', '10-14', '15-19', '>=20'],
+                             'lower': 0},
+        'contract_months': {'edges': [0, 12, 24, 36, 60, np.inf],
+                            'labels': ['<12', '12-23', '24-35', '36-59', '>=60'],
+                            'lower': 0},
+        'team_size': {'edges': [1, 2, 6, 11, 21, np.inf],
+                      'labels': ['1', '2-5', '6-10', '11-20', '>=21'],
+                      'lower': 1}}
+
+
+def check_bins(edges, labels, lower=None, upper=np.inf):
+    """
+    Check that the bins are well defined and cover the whole range of
+    the possible values, without gap
+
+    :params:
+        edges list(): the edges of the bins, closed on the left
+        labels list(): the name of each bin
+        lower float(): the lowest possible value, the first edge must not be above it
+        upper float(): the highest possible value, the last edge must be above it.
+        By default np.inf, the last bin is open ended
+    :raise:
+        ValueError: if the bins are inconsistent
+    """
+    edges = np.asarray(edges, dtype=float)
+    if len(labels) != len(edges) - 1:
+        raise ValueError('{} labels given for {} bins'.format(len(labels), len(edges) - 1))
+    if np.any(np.diff(edges) <= 0):
+        raise ValueError('The edges are not strictly increasing: {}'.format(edges))
+    if lower is not None and edges[0] > lower:
+        raise ValueError('The values between {} and {} are not covered'.format(lower, edges[0]))
+    if upper is not None and edges[-1] < upper:
+        raise ValueError('The values between {} and {} are not covered'.format(edges[-1], upper))
+
+
+def bin_column(serie, edges, labels, strict=True, lower=None, upper=np.inf):
+    """
+    Recategorise a numerical column into bins in one vectorised operation.
+    The values that cannot be converted into numbers are considered missing
+
+    :params:
+        serie pd.Series(): the column to recategorise
+        edges list(): the edges of the bins, closed on the left
+        labels list(): the name of each bin
+        strict bool(): if True (Default), raise a ValueError if some values
+        fall outside the bins, otherwise they become NaN
+        lower float(): the lowest possible value, see check_bins()
+        upper float(): the highest possible value, see check_bins()
+    :return:
+        pd.Series(): ordered categorical with the labels as categories
+    """
+    check_bins(edges, labels, lower, upper)
+    values = pd.to_numeric(serie, errors='coerce')
+    binned = pd.cut(values, bins=edges, labels=labels, right=False)
+    if strict:
+        outside = values.notnull() & binned.isnull()
+        if outside.any():
+            raise ValueError('Values outside of the bins: {}'.format(sorted(values[outside].unique().tolist())))
+    return binned
+
+
+def bin_question(df, colname, bins_name, new_colname=None, strict=True):
+    """
+    Apply one of the declared BINS to a column of the dataframe
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colname str(): the column to recategorise
+        bins_name str(): key in BINS
+        new_colname str(): name of the created column. If None, the
+        column is replaced
+    :return:
+        df pd.df(): the same dataframe with the binned column
+    """
+    if new_colname is None:
+        new_colname = colname
+    bins = BINS[bins_name]
+    df[new_colname] = bin_column(df[colname], bins['edges'], bins['labels'], strict,
+                                 bins.get('lower'), bins.get('upper', np.inf))
+    return df
+
+
 def replace_project(x):
     """
     To use with df[column].apply(replaceproject) to change the
     the number into a specific categorie
+    Kept for the old scripts, bin_question(df, col, 'software_projects')
+    does the same on the whole column at once
     :params:
         x int(): this is the value of the row to match with a
         category
@@ -86,22 +178,10 @@ def replace_project(x):
     """
     if pd.isnull(x):
         return
-    if x >=1 and x <=3:
-        return "1-3"
-    elif x >=4 and x <=6:
-        return "4-6"
-    elif x >=7 and x <=9:
-        return "7-9"
-    elif x > 10 and x <= 12:
-        return "10-12"
-    elif x > 13 and x <= 15:
-        return "13-15"
-    elif x > 16 and x <= 18:
-        return "16-18"
-    elif x > 19 and x <= 21:
-        return "19-21"
-    elif x >= 22:
-        return ">=22"
+    bins = BINS['software_projects']
+    i = np.digitize(x, bins['edges']) - 1
+    if 0 <= i < len(bins['labels']):
+        return bins['labels'][i]
 
 
 def main():
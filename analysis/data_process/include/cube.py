@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Precomputed counts of all the questions crossed with the demographic
+dimensions (country, age, gender, ...).
+For each dimension (and optionally each pair of dimensions) one dense array is
+computed with a single np.bincount() over the encoded data. Its first axis holds
+all the answers of all the questions one after the other, the other axes are the
+answers of the dimensions. Getting the breakdown of a question is then a slice of
+that array instead of a new pd.crosstab().
+"""
+
+import json
+import itertools
+import pandas as pd
+import numpy as np
+
+import encoding
+
+
+def get_questions_to_cube(type_questions, exclude_types=('messy_data', 'single_item')):
+    """
+    Flatten the content of to_plot.json into a list of columns
+
+    :params:
+        type_questions dict(): content of to_plot.json
+        exclude_types tuple(): types of question not worth counting (free text
+        has as many answers as respondents)
+
+    :return:
+        list(): the column names
+    """
+    questions = list()
+    for kind in ['single_questions', 'grouped_questions']:
+        for type_q, list_q in type_questions.get(kind, {}).items():
+            if type_q in exclude_types:
+                continue
+            for group in list_q:
+                for q in group:
+                    if q not in questions:
+                        questions.append(q)
+    return questions
+
+
+def _pooled_keys(question_codes, offsets):
+    """
+    Shift the codes of each question by its offset, to have one unique key
+    per (question, answer) in a matrix respondents x questions
+    """
+    return np.where(question_codes >= 0, question_codes + offsets, -1)
+
+
+def _count_dimensions(keys, n_keys, dim_codes, dim_sizes):
+    """
+    Count the keys for each combination of answers of the dimensions,
+    all questions at once
+
+    :params:
+        keys np.array(): respondents x questions keys, see _pooled_keys()
+        n_keys int(): total number of (question, answer)
+        dim_codes list(): codes of each dimension
+        dim_sizes list(): number of answers of each dimension
+
+    :return:
+        np.array(): of shape (n_keys, *dim_sizes)
+    """
+    # Combine the dimensions in one code per respondent
+    flat_dim = np.zeros(keys.shape[0], dtype=np.int64)
+    valid_dim = np.ones(keys.shape[0], dtype=bool)
+    for codes, size in zip(dim_codes, dim_sizes):
+        flat_dim = flat_dim * size + codes
+        valid_dim &= codes >= 0
+    n_cells = int(np.prod(dim_sizes))
+
+    combined = keys.astype(np.int64) * n_cells + flat_dim[:, np.newaxis]
+    valid = (keys >= 0) & valid_dim[:, np.newaxis]
+    counts = np.bincount(combined[valid], minlength=n_keys * n_cells)
+    return counts.reshape([n_keys] + list(dim_sizes))
+
+
+def build_cube(df, questions, dimensions, pairs=False, categories=None):
+    """
+    Compute the counts of all the questions for each dimension
+
+    :params:
+        df pd.df(): dataframe containing the cleaned data
+        questions list(): columns to count, see get_questions_to_cube()
+        dimensions list(): columns used as demographic dimensions
+        pairs bool(): also compute the counts for each pair of dimensions
+        categories dict(): colnames as keys and possible answers as values,
+        see encoding.encode_df()
+
+    :return:
+        dict(): the cube with the keys
+            'questions' list(): the counted questions
+            'categories' list(): the answers of each question
+            'offsets' list(): the position of the first answer of each question
+                on the first axis of the arrays
+            'dimensions' list(): the dimensions
+            'dim_categories' list(): the answers of each dimension
+            'arrays' dict(): the arrays of counts, the key is the tuple of the
+                indices of the dimensions (the empty tuple for the total counts)
+    """
+    encoded_q = encoding.encode_df(df, questions, categories)
+    encoded_d = encoding.encode_df(df, dimensions, categories)
+
+    sizes = [len(c) for c in encoded_q['categories']]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    n_keys = int(np.sum(sizes))
+    keys = _pooled_keys(encoded_q['codes'], offsets)
+
+    dim_sizes = [len(c) for c in encoded_d['categories']]
+    # The empty combination holds the counts over all the respondents
+    combinations = [()] + [(i,) for i in range(len(dimensions))]
+    if pairs:
+        combinations += list(itertools.combinations(range(len(dimensions)), 2))
+
+    arrays = dict()
+    for comb in combinations:
+        arrays[comb] = _count_dimensions(keys, n_keys,
+                                         [encoded_d['codes'][:, i] for i in comb],
+                                         [dim_sizes[i] for i in comb])
+
+    return {'questions': encoded_q['columns'],
+            'categories': encoded_q['categories'],
+            'offsets': [int(i) for i in offsets],
+            'dimensions': encoded_d['columns'],
+            'dim_categories': encoded_d['categories'],
+            'arrays': arrays}
+
+
+def _get_array(cube, dimensions):
+    """
+    Return the array, the order of the dimensions in it (sorted) and
+    the order of the dimensions asked
+    """
+    if not isinstance(dimensions, (list, tuple)):
+        dimensions = [dimensions]
+    idx = [cube['dimensions'].index(d) for d in dimensions]
+    key = tuple(sorted(idx))
+    if key not in cube['arrays']:
+        raise KeyError('The cube has not been computed for the dimensions {}'.format(dimensions))
+    return cube['arrays'][key], key, idx
+
+
+def cube_table(cube, question, dimensions):
+    """
+    Crosstab of a question against one or two dimensions, as
+    pd.crosstab(df[question], [df[dim1], df[dim2]]) returns
+
+    :params:
+        cube dict(): output of build_cube()
+        question str(): the question
+        dimensions str() or list(): one dimension or a pair of dimensions
+
+    :return:
+        pd.df(): answers as rows, answers of the dimensions as columns,
+        in the order of dimensions
+    """
+    array, key, idx = _get_array(cube, dimensions)
+    i = cube['questions'].index(question)
+    answers = cube['categories'][i]
+    start = cube['offsets'][i]
+    # The arrays are stored with the dimensions sorted, put them back in the order asked
+    counts = np.transpose(array[start:start + len(answers)], [0] + [1 + key.index(d) for d in idx])
+
+    dim_cats = [cube['dim_categories'][d] for d in idx]
+    dim_names = [cube['dimensions'][d] for d in idx]
+    if len(idx) == 1:
+        columns = pd.Index(dim_cats[0], name=dim_names[0])
+    else:
+        columns = pd.MultiIndex.from_product(dim_cats, names=dim_names)
+    return pd.DataFrame(counts.reshape(len(answers), -1),
+                        index=pd.Index(answers, name=question),
+                        columns=columns)
+
+
+def cube_freq_table(cube, question, dimension=None, value=None, add_ratio=False):
+    """
+    Equivalent of freq_table() for the respondents that gave `value`
+    to the `dimension`. If dimension is None, the count over all the
+    respondents is returned
+
+    :params:
+        cube dict(): output of build_cube()
+        question str(): the question
+        dimension str(): the dimension to filter on
+        value str(): the answer of the dimension to keep
+        add_ratio bool(): add a column 'ratio'
+
+    :return:
+        pd.df(): dataframe with a column 'count' indexed by the answers
+    """
+    if dimension is None:
+        i = cube['questions'].index(question)
+        answers = cube['categories'][i]
+        start = cube['offsets'][i]
+        counts = pd.Series(cube['arrays'][()][start:start + len(answers)],
+                           index=pd.Index(answers, name=question))
+    else:
+        counts = cube_table(cube, question, dimension)[value]
+    output = pd.DataFrame({'count': counts})
+    if add_ratio:
+        total = counts.sum()
+        output['ratio'] = counts / total if total else 0.
+    return output
+
+
+def save_cube(cube, output_location):
+    """
+    Save the cube into a compressed npz file. The metadata are
+    stored as a json string inside the archive
+
+    :params:
+        cube dict(): output of build_cube()
+        output_location str(): path to the file
+    """
+    metadata = {k: cube[k] for k in ['questions', 'categories', 'offsets',
+                                      'dimensions', 'dim_categories']}
+    arrays = {'dims_' + '_'.join(str(i) for i in key): array
+              for key, array in cube['arrays'].items()}
+    np.savez_compressed(output_location, metadata=json.dumps(metadata, default=str), **arrays)
+
+
+def load_cube(input_location):
+    """
+    Load a cube saved with save_cube()
+    """
+    with np.load(input_location) as data:
+        cube = json.loads(str(data['metadata']))
+        cube['arrays'] = {tuple(int(i) for i in name.split('_')[1:] if i): data[name]
+                          for name in data.files if name != 'metadata'}
+    return cube
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    with open('../uk_2017/to_plot.json', 'r') as f:
+        type_questions = json.load(f)
+
+    dimensions = ['In which country do you work?',
+                  'Please select your gender',
+                  'Please select your age']
+    questions = get_questions_to_cube(type_questions)
+    cube = build_cube(df, questions, dimensions, pairs=True)
+    print(cube_table(cube, 'Do you write code as part of your job?', dimensions[1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Optional SQLite backend for the cleaned data (sqlite3 is in the standard library).
+The cleaned data, preferably renamed with the short codes of the questions
+(see questions.rename_to_codes()), is loaded once into a database with indexes
+on the demographic columns. The filtered counts (what freq_table() and
+count_unique_value() compute on subsets built with df.loc[...]) then run inside
+the database and only the aggregated table comes back as a dataframe.
+The filters are given as a dictionary and always passed as parameters of
+the query, never formatted into the SQL.
+"""
+
+import sqlite3
+import pandas as pd
+
+
+TABLE = 'responses'
+# Demographic questions: country, gender, age, salary, ethnicity, type of organisation
+DEFAULT_INDEXES = ('socio1', 'socio2', 'socio3', 'socio4', 'socio5', 'currentEmp1')
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'IN', 'NOT IN', 'IS NULL', 'IS NOT NULL')
+
+
+def quote(name):
+    """
+    Quote a column or table name for SQLite
+    """
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+def create_database(df, path=':memory:', table=TABLE, indexes=DEFAULT_INDEXES):
+    """
+    Load the data into a SQLite database
+
+    :params:
+        df pd.df(): dataframe containing the data
+        path str(): file of the database, in memory by default
+        table str(): name of the table, replaced if it exists
+        indexes list(): columns to index, the ones not in df are skipped
+
+    :return:
+        sqlite3.Connection(): the connection to the database
+    """
+    connection = sqlite3.connect(path)
+    df.to_sql(table, connection, index=False, if_exists='replace')
+    for col in indexes:
+        if col in df.columns:
+            connection.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                quote('idx_{}_{}'.format(table, col)), quote(table), quote(col)))
+    connection.commit()
+    return connection
+
+
+def build_where(filters):
+    """
+    Build the WHERE clause of a query
+
+    :params:
+        filters dict(): column as key and as value either an answer, a list of
+        answers, None (missing value) or a tuple (operator, value) with an
+        operator of OPERATORS, for instance {'socio1': 'United Kingdom',
+        'Last page': ('>', 1), 'socio2': ['Female', 'Other']}
+
+    :return:
+        str(): the clause, empty if there is no filter
+        list(): the parameters of the clause
+    """
+    if not filters:
+        return '', []
+    conditions = list()
+    params = list()
+    for col, value in filters.items():
+        if isinstance(value, tuple):
+            operator, value = value
+        elif isinstance(value, list):
+            operator = 'IN'
+        elif value is None:
+            operator = 'IS NULL'
+        else:
+            operator = '='
+        operator = operator.upper()
+        if operator not in OPERATORS:
+            raise ValueError('Unknown operator: {}'.format(operator))
+        if operator in ('IS NULL', 'IS NOT NULL'):
+            conditions.append('{} {}'.format(quote(col), operator))
+        elif operator in ('IN', 'NOT IN'):
+            value = list(value)
+            conditions.append('{} {} ({})'.format(quote(col), operator, ', '.join('?' * len(value))))
+            params.extend(value)
+        else:
+            conditions.append('{} {} ?'.format(quote(col), operator))
+            params.append(value)
+    return ' WHERE ' + ' AND '.join(conditions), params
+
+
+def query(connection, sql, params=None):
+    """
+    Run a query and return the result as a dataframe
+    """
+    return pd.read_sql_query(sql, connection, params=params)
+
+
+def freq_table(connection, colname, filters=None, add_ratio=False, dropna=True, weights=None, table=TABLE):
+    """
+    Count the answers of a column for the respondents matching the filters
+
+    :params:
+        connection sqlite3.Connection(): output of create_database()
+        colname str(): the column
+        filters dict(): see build_where()
+        add_ratio bool(): add the column 'ratio' over the counted respondents
+        dropna bool(): do not count the missing values
+        weights str(): optional column with the weight of each respondent
+        table str(): name of the table
+
+    :return:
+        pd.df(): indexed by answer with the column 'count' (and 'ratio')
+    """
+    filters = dict(filters or {})
+    if dropna:
+        filters.setdefault(colname, ('IS NOT NULL', None))
+    where, params = build_where(filters)
+    count = 'SUM({})'.format(quote(weights)) if weights is not None else 'COUNT(*)'
+    sql = 'SELECT {col} AS answer, {count} AS count FROM {table}{where} GROUP BY {col} ORDER BY {col}'.format(
+        col=quote(colname), count=count, table=quote(table), where=where)
+    output = query(connection, sql, params).set_index('answer')
+    output.index.name = colname
+    if add_ratio:
+        output['ratio'] = output['count'] / float(output['count'].sum())
+    return output
+
+
+def count_unique_value(connection, colnames, filters=None, normalize=False, dropna=True, weights=None,
+                       table=TABLE):
+    """
+    Count the answers of several columns in one query, as count_unique_value()
+
+    :params:
+        connection sqlite3.Connection(): output of create_database()
+        colnames list(): the columns, a list of list is flattened
+        filters dict(): see build_where()
+        normalize bool(): ratios per column instead of counts
+        dropna bool(): do not count the missing values
+        weights str(): optional column with the weight of each respondent
+        table str(): name of the table
+
+    :return:
+        pd.df(): one row per column and one column per answer (NaN for the
+        missing values if dropna is False), 0 for the answers not given to a column
+    """
+    colnames = [c for col in colnames for c in (col if isinstance(col, list) else [col])]
+    where, params = build_where(filters)
+    count = 'SUM({})'.format(quote(weights)) if weights is not None else 'COUNT(*)'
+    parts = list()
+    for col in colnames:
+        clause = where
+        if dropna:
+            clause = (where + ' AND ' if where else ' WHERE ') + '{} IS NOT NULL'.format(quote(col))
+        parts.append('SELECT ? AS question, {col} AS answer, {count} AS count FROM {table}{where} '
+                     'GROUP BY {col}'.format(col=quote(col), count=count, table=quote(table), where=clause))
+    all_params = list()
+    for col in colnames:
+        all_params.extend([col] + params)
+    counts = query(connection, ' UNION ALL '.join(parts), all_params)
+    output = counts.pivot_table(index='question', columns='answer', values='count',
+                                aggfunc='sum', dropna=False).reindex(colnames).fillna(0)
+    if normalize:
+        output = output.div(output.sum(axis=1), axis=0)
+    output.columns.name = None
+    output.index.name = None
+    return output
+
+
+def crosstab(connection, row, column, filters=None, weights=None, table=TABLE):
+    """
+    Number of respondents for each pair of answers of two columns
+
+    :params:
+        connection sqlite3.Connection(): output of create_database()
+        row str(): the column giving the rows
+        column str(): the column giving the columns
+        filters dict(): see build_where()
+        weights str(): optional column with the weight of each respondent,
+        the cells are then the sum of the weights
+        table str(): name of the table
+
+    :return:
+        pd.df(): answers of row as index, answers of column as columns
+    """
+    filters = dict(filters or {})
+    filters.setdefault(row, ('IS NOT NULL', None))
+    filters.setdefault(column, ('IS NOT NULL', None))
+    where, params = build_where(filters)
+    count = 'SUM({})'.format(quote(weights)) if weights is not None else 'COUNT(*)'
+    sql = 'SELECT {r} AS row, {c} AS col, {count} AS count FROM {table}{where} GROUP BY {r}, {c}'.format(
+        r=quote(row), c=quote(column), count=count, table=quote(table), where=where)
+    counts = query(connection, sql, params)
+    output = counts.pivot(index='row', columns='col', values='count').fillna(0)
+    if weights is None:
+        output = output.astype(int)
+    output.index.name = row
+    output.columns.name = column
+    return output
+
+
+def main():
+    """
+    """
+    from questions import load_questions, rename_to_codes
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv', index_col=0)
+    df, _ = rename_to_codes(df, load_questions('../../../survey_creation/uk_17/uk_17.csv'))
+    connection = create_database(df)
+    print(freq_table(connection, 'socio2', {'socio1': 'United Kingdom', 'Last page': ('>', 1)}, add_ratio=True))
+    print(crosstab(connection, 'socio3', 'socio2'))
+
+
+if __name__ == "__main__":
+    main()
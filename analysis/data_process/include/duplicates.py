@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Detection of the duplicated responses (the same person submitting the survey
+several times through an open link).
+Each row is hashed over the answer columns with pd.util.hash_pandas_object(),
+and the exact duplicates are the rows sharing a hash (hash group-by, O(n)).
+For the near-duplicates, the columns are split into max_diff + 1 blocks: two
+rows differing on at most max_diff columns have at least one identical block,
+so the rows sharing the hash of a block are the only candidates, and the
+number of different answers is then counted on the encoded answers.
+"""
+
+import itertools
+import pandas as pd
+import numpy as np
+
+from encoding import encode_df
+from raw_loader import get_usecols
+
+
+# Metadata of each submission, different between two submissions of the same answers.
+# Dropped in addition to the limesurvey columns and timings of get_usecols()
+NOT_ANSWERS = ('Unnamed: 0', 'Last page', 'Total time', 'Interview time',
+               'Response ID', 'Date submitted', 'Date started', 'Date last action',
+               'Start language', 'Referrer URL', 'Seed', 'IP address', 'Token')
+
+
+def get_answer_columns(df, colnames=None):
+    """
+    Columns containing the answers of the respondents
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): columns to restrict to, all the columns of df if None
+
+    :return:
+        list(): the columns without the metadata of the submissions
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    return [col for col in get_usecols(colnames) if col.strip() not in NOT_ANSWERS]
+
+
+def row_hashes(df, colnames):
+    """
+    Hash of each row over the columns
+
+    :return:
+        np.array(): uint64 hash of each row
+    """
+    return pd.util.hash_pandas_object(df[colnames], index=False).values
+
+
+def find_exact_duplicates(df, colnames=None, min_answered=5):
+    """
+    Groups of respondents with exactly the same answers
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the answer columns, all the columns if None. The
+        metadata of the submissions are always removed (see get_answer_columns())
+        min_answered int(): the respondents with fewer answers are not
+        considered, they would be duplicates of each other
+
+    :return:
+        pd.df(): one row per duplicated respondent with the columns 'index'
+        (index in df), 'group' and 'first' (index of the first respondent of
+        the group, the one to keep)
+    """
+    colnames = get_answer_columns(df, colnames)
+    enough = (df[colnames].notnull().sum(axis=1) >= min_answered).values
+    groups, _ = pd.factorize(row_hashes(df, colnames))
+    groups = np.where(enough, groups, -1)
+    sizes = np.bincount(groups[groups >= 0], minlength=groups.max() + 1 if len(groups) else 0)
+    duplicated = (groups >= 0) & (sizes[np.maximum(groups, 0)] > 1)
+    output = pd.DataFrame({'index': df.index[duplicated], 'group': groups[duplicated]})
+    output['first'] = output.groupby('group')['index'].transform('first')
+    return output
+
+
+def get_blocks(colnames, n_blocks):
+    """
+    Split the columns into n_blocks contiguous blocks
+    """
+    return [list(block) for block in np.array_split(np.array(colnames, dtype=object), n_blocks)]
+
+
+def find_near_duplicates(df, colnames=None, max_diff=3, min_answered=5, max_bucket=1000):
+    """
+    Pairs of respondents with at most max_diff different answers
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the answer columns, all the columns if None. The
+        metadata of the submissions are always removed (see get_answer_columns())
+        max_diff int(): maximum number of columns with a different answer
+        (a missing value is an answer different from any other)
+        min_answered int(): the respondents with fewer answers are not considered
+        max_bucket int(): blocks shared by more respondents are skipped, to avoid
+        comparing all the pairs of a very common block
+
+    :return:
+        pd.df(): one row per pair with the columns 'index_1', 'index_2' and 'n_diff'
+    """
+    colnames = get_answer_columns(df, colnames)
+    enough = (df[colnames].notnull().sum(axis=1) >= min_answered).values
+    candidates = set()
+    for block in get_blocks(colnames, max_diff + 1):
+        hashes = pd.Series(row_hashes(df, block))
+        # A block without any answer does not tell anything
+        hashes = hashes[enough & df[block].notnull().any(axis=1).values]
+        for rows in hashes.groupby(hashes).indices.values():
+            if 1 < len(rows) <= max_bucket:
+                candidates.update(itertools.combinations(hashes.index[rows], 2))
+    if not candidates:
+        return pd.DataFrame(columns=['index_1', 'index_2', 'n_diff'])
+    pairs = np.array(sorted(candidates), dtype=np.int64)
+    codes = encode_df(df, colnames)['codes']
+    n_diff = (codes[pairs[:, 0]] != codes[pairs[:, 1]]).sum(axis=1)
+    keep = n_diff <= max_diff
+    return pd.DataFrame({'index_1': df.index[pairs[keep, 0]],
+                         'index_2': df.index[pairs[keep, 1]],
+                         'n_diff': n_diff[keep]})
+
+
+def drop_duplicates(df, duplicates):
+    """
+    Remove the duplicated respondents, keeping the first one of each group
+
+    :params:
+        df pd.df(): dataframe containing the data
+        duplicates pd.df(): output of find_exact_duplicates()
+
+    :return:
+        df pd.df(): the dataframe without the duplicates
+    """
+    to_drop = duplicates.loc[duplicates['index'] != duplicates['first'], 'index']
+    return df.drop(to_drop)
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    print(find_exact_duplicates(df))
+    print(find_near_duplicates(df))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Integer encoding of the answers.
+Each column is converted into an array of codes, the position of the answer
+in the list of the possible answers (the categories), with -1 for the missing
+values. Working on the codes instead of the strings allows to count with
+np.bincount() and to compare columns without any python loop.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+def encode_column(serie, categories=None):
+    """
+    Encode a column into integer codes
+
+    :params:
+        serie pd.Series(): the column to encode
+        categories list(): the possible answers, in the order they should be
+        coded (for instance the content of a listAnswers file). If None (Default)
+        the sorted unique values of the column are used. The values that are not
+        in the categories are coded as missing
+
+    :return:
+        codes np.array(): array of int, -1 for the missing values
+        categories list(): the answer corresponding to each code
+    """
+    if categories is None:
+        try:
+            cat = pd.Categorical(serie)
+        except TypeError:  # Cannot sort mixed types, keep the order of appearance
+            cat = pd.Categorical(serie, categories=pd.unique(serie.dropna()))
+    else:
+        cat = pd.Categorical(serie, categories=categories)
+    return np.asarray(cat.codes, dtype=np.int32), cat.categories.tolist()
+
+
+def encode_df(df, colnames=None, categories=None):
+    """
+    Encode several columns of a dataframe in one matrix of codes
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): columns to encode. If None (Default), all the columns
+        categories dict(): colnames as keys and the list of possible answers as
+        values, for the columns that should not use their own unique values
+
+    :return:
+        dict(): with the keys
+            'columns' list(): the encoded columns
+            'codes' np.array(): matrix respondents x columns of int codes
+            'categories' list(): list of the answers for each column
+    """
+    if colnames is None:
+        colnames = list(df.columns)
+    if categories is None:
+        categories = dict()
+
+    codes = np.empty((len(df.index), len(colnames)), dtype=np.int32)
+    list_categories = list()
+    for i, col in enumerate(colnames):
+        codes[:, i], cat = encode_column(df[col], categories.get(col))
+        list_categories.append(cat)
+
+    return {'columns': list(colnames),
+            'codes': codes,
+            'categories': list_categories}
+
+
+def get_codes(encoded, colname):
+    """
+    Return the codes and the categories of one column of an encoded dataset
+
+    :params:
+        encoded dict(): output of encode_df()
+        colname str(): the column name
+
+    :return:
+        codes np.array(), categories list()
+    """
+    i = encoded['columns'].index(colname)
+    return encoded['codes'][:, i], encoded['categories'][i]
+
+
+def count_codes(codes, n_categories, weights=None):
+    """
+    Count the occurrence of each code, ignoring the missing values
+
+    :params:
+        codes np.array(): array of int codes, -1 for missing
+        n_categories int(): number of possible codes
+        weights np.array(): optional weight of each row
+
+    :return:
+        np.array(): the count for each code
+    """
+    valid = codes >= 0
+    if weights is not None:
+        weights = weights[valid]
+    return np.bincount(codes[valid], weights=weights, minlength=n_categories)
+
+
+def decode_counts(counts, categories, name='count'):
+    """
+    Transform an array of counts into a dataframe indexed
+    by the answers, as freq_table() returns
+
+    :params:
+        counts np.array(): output of count_codes()
+        categories list(): the answers corresponding to each count
+        name str(): name of the column
+
+    :return:
+        pd.df(): the counts indexed by answers
+    """
+    return pd.DataFrame({name: counts}, index=pd.Index(categories))
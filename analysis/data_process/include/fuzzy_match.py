@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fuzzy matching of the free text typed in the 'Other' fields against the
+catalogs of listAnswers (universities, countries, academic fields, ...).
+An inverted index from each character trigram to the catalog entries containing
+it is built once per catalog. A batch of values is then scored against the whole
+catalog with a single np.bincount over the postings of their trigrams, giving the
+Jaccard similarity between the trigram sets. The matches above a threshold can
+be proposed for review or applied directly, as merging_others() does with
+hand-written dictionaries.
+"""
+
+import pandas as pd
+import numpy as np
+
+from heavy_hitters import normalise_text
+
+
+def trigrams(text):
+    """
+    Set of the character trigrams of the normalised text. The words
+    are padded with spaces to give more weight to their beginning and end
+
+    :params:
+        text str(): the text
+
+    :return:
+        set(): the trigrams, empty if the text is empty
+    """
+    text = normalise_text(text)
+    if text is None:
+        return set()
+    text = '  ' + text + ' '
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def build_trigram_index(catalog):
+    """
+    Build the inverted index of a catalog
+
+    :params:
+        catalog list(): the answers of the catalog
+
+    :return:
+        dict(): with the keys
+            'catalog' list(): the answers
+            'vocabulary' dict(): trigram as key and its id as value
+            'postings' list(): for each trigram id, np.array() of the catalog entries containing it
+            'sizes' np.array(): number of trigrams of each entry
+    """
+    vocabulary = dict()
+    postings = list()
+    sizes = np.zeros(len(catalog), dtype=np.int64)
+    for entry_id, entry in enumerate(catalog):
+        grams = trigrams(entry)
+        sizes[entry_id] = len(grams)
+        for gram in grams:
+            if gram not in vocabulary:
+                vocabulary[gram] = len(postings)
+                postings.append([])
+            postings[vocabulary[gram]].append(entry_id)
+    return {'catalog': list(catalog),
+            'vocabulary': vocabulary,
+            'postings': [np.array(p, dtype=np.int64) for p in postings],
+            'sizes': sizes}
+
+
+def similarity_matrix(index, values):
+    """
+    Jaccard similarity between the trigrams of each value and each catalog entry
+
+    :params:
+        index dict(): output of build_trigram_index()
+        values list(): the values to match
+
+    :return:
+        np.array(): matrix values x catalog entries
+    """
+    n_catalog = len(index['catalog'])
+    keys = list()
+    value_sizes = np.zeros(len(values), dtype=np.int64)
+    for value_id, value in enumerate(values):
+        grams = trigrams(value)
+        value_sizes[value_id] = len(grams)
+        for gram in grams:
+            gram_id = index['vocabulary'].get(gram)
+            if gram_id is not None:
+                keys.append(index['postings'][gram_id] + value_id * n_catalog)
+    if keys:
+        keys = np.concatenate(keys)
+    else:
+        keys = np.empty(0, dtype=np.int64)
+    intersection = np.bincount(keys, minlength=len(values) * n_catalog).reshape(len(values), n_catalog)
+    union = value_sizes[:, np.newaxis] + index['sizes'][np.newaxis, :] - intersection
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(union > 0, intersection / union.astype(float), 0.)
+
+
+def match_values(index, values, top=1, threshold=0.):
+    """
+    Find the best catalog entries for each unique value
+
+    :params:
+        index dict(): output of build_trigram_index()
+        values iterable: the values to match, the missing values and
+        duplicates are removed
+        top int(): number of candidates per value
+        threshold float(): candidates with a lower similarity are not returned
+
+    :return:
+        pd.df(): with the columns 'value', 'match', 'score', sorted by value
+        and decreasing score
+    """
+    values = [v for v in pd.unique(pd.Series(list(values)).dropna())]
+    if not values:
+        return pd.DataFrame(columns=['value', 'match', 'score'])
+    scores = similarity_matrix(index, values)
+    top = min(top, scores.shape[1])
+    # Indices of the `top` best entries of each row, in decreasing order
+    best = np.argsort(-scores, axis=1, kind='mergesort')[:, :top]
+    rows = np.repeat(np.arange(len(values)), top)
+    cols = best.ravel()
+    result = pd.DataFrame({'value': [values[i] for i in rows],
+                           'match': [index['catalog'][j] for j in cols],
+                           'score': scores[rows, cols]})
+    return result.loc[result['score'] >= threshold].reset_index(drop=True)
+
+
+def get_replacement_values(matches, threshold=0.8):
+    """
+    Dictionary {value: match} of the best match of each value above the threshold
+
+    :params:
+        matches pd.df(): output of match_values()
+        threshold float(): minimum similarity to accept a match
+
+    :return:
+        dict(): the accepted matches
+    """
+    accepted = matches.loc[matches['score'] >= threshold]
+    accepted = accepted.sort_values('score', ascending=False).drop_duplicates('value')
+    return dict(zip(accepted['value'], accepted['match']))
+
+
+def merge_other_matches(df, colname, index, threshold=0.8, colname_other=None):
+    """
+    Replace the 'Other' answers of a column with the catalog entry matching
+    the text typed in the associated '[Other]' column, when the similarity
+    is above the threshold
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colname str(): the column with the catalog answers
+        index dict(): output of build_trigram_index() for the catalog of the column
+        threshold float(): minimum similarity to accept a match
+        colname_other str(): column with the free text. By default the raw text kept
+        by the cleaning, '[OTHER_RAW] ' + colname + ' [Other]', as colname + ' [Other]'
+        only holds 'Yes' in the cleaned data
+
+    :return:
+        df pd.df(): the same dataframe with the replaced values
+        matches pd.df(): all the candidates, to review the ones below the threshold
+    """
+    if colname_other is None:
+        colname_other = '[OTHER_RAW] ' + colname + ' [Other]'
+    others = df[colname_other]
+    matches = match_values(index, others)
+    replacement = get_replacement_values(matches, threshold)
+    mapped = others.map(replacement)
+    to_replace = (df[colname] == 'Other') & mapped.notnull()
+    df.loc[to_replace, colname] = mapped[to_replace]
+    return df, matches
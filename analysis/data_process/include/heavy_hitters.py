@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Profiling of the free-text columns (the 'messy_data' questions and the
+'[OTHER_RAW]' columns) to find their dominant values.
+All the columns are read in one scan, the values are normalised (case, spaces,
+punctuation) and counted with the Space-Saving algorithm, which keeps at most
+`capacity` counters per column whatever the number of distinct values.
+The report is a small table of the top values of each column, enough to write
+the dictionaries used by recode_values() without printing the whole columns.
+
+Space-Saving: Metwally, Agrawal and El Abbadi, Efficient Computation of
+Frequent and Top-k Elements in Data Streams, 2005
+"""
+
+import re
+import heapq
+import pandas as pd
+
+
+RE_PUNCTUATION = re.compile(r'[^\w\s+#/&-]', re.UNICODE)
+RE_SPACES = re.compile(r'\s+', re.UNICODE)
+
+
+def normalise_text(value):
+    """
+    Lower case, remove the punctuation (keeping the characters used in names
+    such as C++, C#, R&D or I/O) and collapse the white spaces
+
+    :params:
+        value str(): the raw answer
+
+    :return:
+        str(): the normalised answer, None if it is empty
+    """
+    if pd.isnull(value):
+        return None
+    value = RE_PUNCTUATION.sub(' ', str(value).lower())
+    value = RE_SPACES.sub(' ', value).strip()
+    return value or None
+
+
+def space_saving_create(capacity=100):
+    """
+    Create an empty Space-Saving summary
+
+    :params:
+        capacity int(): maximum number of counters kept
+
+    :return:
+        dict(): with the counters {value: [count, error]}
+    """
+    return {'capacity': capacity, 'n': 0, 'counters': dict()}
+
+
+def space_saving_update(summary, value, count=1):
+    """
+    Add `count` occurrences of a value. When the summary is full, the counter
+    with the lowest count is replaced and its count becomes the error of the new one
+    """
+    counters = summary['counters']
+    summary['n'] += count
+    if value in counters:
+        counters[value][0] += count
+    elif len(counters) < summary['capacity']:
+        counters[value] = [count, 0]
+    else:
+        min_value = min(counters, key=lambda k: counters[k][0])
+        min_count = counters.pop(min_value)[0]
+        counters[value] = [min_count + count, min_count]
+    return summary
+
+
+def space_saving_top(summary, top=10):
+    """
+    Return the `top` values with their estimated count and
+    the maximum overestimation of that count
+
+    :return:
+        list(): list of tuple (value, count, error)
+    """
+    items = heapq.nlargest(top, summary['counters'].items(), key=lambda x: x[1][0])
+    return [(value, count, error) for value, (count, error) in items]
+
+
+def get_free_text_columns(df, type_questions=None):
+    """
+    Columns to profile: the 'messy_data' questions of to_plot.json and
+    all the '[OTHER_RAW]' columns
+
+    :params:
+        df pd.df(): dataframe containing the data
+        type_questions dict(): content of to_plot.json
+
+    :return:
+        list(): the column names
+    """
+    columns = list()
+    if type_questions is not None:
+        for kind in ['single_questions', 'grouped_questions']:
+            for group in type_questions.get(kind, {}).get('messy_data', []):
+                columns.extend(group)
+    columns.extend(col for col in df.columns if col.startswith('[OTHER_RAW]'))
+    # Keep the order but remove duplicates and the columns not in this dataset
+    return [col for i, col in enumerate(columns) if col in df.columns and col not in columns[:i]]
+
+
+def profile_columns(chunks, colnames, capacity=100, summaries=None):
+    """
+    Count the normalised values of all the columns in one scan of the data
+
+    :params:
+        chunks iterable: dataframes, for instance pd.read_csv(..., chunksize=1000),
+        or a list with a single dataframe
+        colnames list(): the columns to profile
+        capacity int(): number of counters kept per column
+        summaries dict(): summaries of a previous scan to update
+
+    :return:
+        dict(): column as key and the Space-Saving summary as value
+    """
+    if summaries is None:
+        summaries = dict()
+    for col in colnames:
+        summaries.setdefault(col, space_saving_create(capacity))
+    for chunk in chunks:
+        for col in colnames:
+            if col not in chunk.columns:
+                continue
+            # Count the raw values first, the normalisation is applied once per distinct value
+            raw_counts = chunk[col].value_counts()
+            normalised = dict()
+            for value, count in raw_counts.items():
+                norm = normalise_text(value)
+                if norm is not None:
+                    normalised[norm] = normalised.get(norm, 0) + count
+            for value, count in normalised.items():
+                space_saving_update(summaries[col], value, int(count))
+    return summaries
+
+
+def heavy_hitters_report(summaries, top=10, min_count=2):
+    """
+    Table of the dominant values of each column
+
+    :params:
+        summaries dict(): output of profile_columns()
+        top int(): number of values per column
+        min_count int(): values with a lower count are not reported
+
+    :return:
+        pd.df(): with the columns 'column', 'value', 'count', 'error' and 'ratio'
+        (share of the non-empty answers)
+    """
+    rows = list()
+    for col, summary in summaries.items():
+        for value, count, error in space_saving_top(summary, top):
+            if count >= min_count:
+                rows.append((col, value, count, error, count / float(summary['n'])))
+    return pd.DataFrame(rows, columns=['column', 'value', 'count', 'error', 'ratio'])
+
+
+def write_report(report, output_location):
+    """
+    Write the report into a csv file
+    """
+    report.to_csv(output_location, index=False)
+
+
+def main():
+    """
+    """
+    import json
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    with open('../uk_2017/to_plot.json', 'r') as f:
+        type_questions = json.load(f)
+    columns = get_free_text_columns(df, type_questions)
+    summaries = profile_columns([df], columns)
+    pd.set_option('display.max_rows', 300)
+    print(heavy_hitters_report(summaries, top=5))
+
+
+if __name__ == "__main__":
+    main()
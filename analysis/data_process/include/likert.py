@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Scoring of the Likert questions.
+The catalogs in listAnswers (likert_agree, likert_time_10, likert_satisfied_10,
+likert_usage_5, ...) give the order of the answers. A block of Likert columns is
+converted in one step into a small-integer matrix respondents x items, on which
+the counts, means, medians and top-2-box of all the items (and of all the groups
+of respondents) are computed with one bincount.
+"""
+
+import re
+import pandas as pd
+import numpy as np
+
+
+def get_likert_catalogs(answer_item_dict):
+    """
+    Select the Likert catalogs from the answers parsed by get_answer_item()
+
+    :params:
+        answer_item_dict dict(): filename as key and list of answers as value
+
+    :return:
+        dict(): only the catalogs which name starts with 'likert'
+    """
+    return {k: v for k, v in answer_item_dict.items() if k.startswith('likert')}
+
+
+def likert_scores(catalog):
+    """
+    Numerical value of each answer of the catalog.
+    When all the answers start with a number ('0 - Not at all satisfied', '1', ...)
+    that number is used, otherwise the position in the scale starting at 1
+
+    :params:
+        catalog list(): the ordered answers
+
+    :return:
+        np.array(): the score of each answer
+    """
+    numbers = [re.match(r'\s*(\d+)', str(answer)) for answer in catalog]
+    if all(numbers):
+        return np.array([float(n.group(1)) for n in numbers])
+    return np.arange(1, len(catalog) + 1, dtype=float)
+
+
+def _normalise(answer):
+    return str(answer).strip().lower()
+
+
+def encode_likert(df, colnames, catalog):
+    """
+    Convert a block of Likert columns into a matrix of codes. The
+    answers are matched to the catalog without case and surrounding spaces.
+    Only the unique values are matched, the codes are then broadcasted
+    to the whole block
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the Likert columns
+        catalog list(): the ordered answers
+
+    :return:
+        np.array(): matrix of np.int8 codes respondents x items, -1 for missing
+        or unknown answers
+    """
+    code_map = {_normalise(answer): code for code, answer in enumerate(catalog)}
+    values = df[colnames].values
+    missing = pd.isnull(values)
+    uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+    lookup = np.array([code_map.get(_normalise(u), -1) for u in uniques], dtype=np.int8)
+    codes = lookup[inverse.ravel()].reshape(values.shape)
+    codes[missing] = -1
+    return codes
+
+
+def count_likert(codes, n_answers, groups=None, n_groups=None, weights=None):
+    """
+    Count each answer of each item, for each group, with one bincount
+
+    :params:
+        codes np.array(): output of encode_likert()
+        n_answers int(): length of the catalog
+        groups np.array(): optional integer code of the group of each respondent,
+        -1 to exclude a respondent (see encoding.encode_column())
+        n_groups int(): number of groups
+        weights np.array(): optional weight of each respondent (see weighting.rake())
+
+    :return:
+        np.array(): of shape (n_items, n_answers), or (n_groups, n_items, n_answers)
+        if groups is given
+    """
+    n_items = codes.shape[1]
+    keys = np.arange(n_items, dtype=np.int64) * n_answers + codes
+    valid = codes >= 0
+    if weights is not None:
+        weights = np.broadcast_to(np.asarray(weights, dtype=float)[:, np.newaxis], codes.shape)
+    if groups is None:
+        return np.bincount(keys[valid], weights=None if weights is None else weights[valid],
+                           minlength=n_items * n_answers).reshape(n_items, n_answers)
+
+    keys = keys + groups[:, np.newaxis].astype(np.int64) * n_items * n_answers
+    valid &= (groups >= 0)[:, np.newaxis]
+    counts = np.bincount(keys[valid], weights=None if weights is None else weights[valid],
+                         minlength=n_groups * n_items * n_answers)
+    return counts.reshape(n_groups, n_items, n_answers)
+
+
+def summarise_counts(counts, scores, top_box=2):
+    """
+    Compute the statistics from the counts of the answers. The last axis
+    of counts has to be the answers, all the other axes are kept
+
+    :params:
+        counts np.array(): output of count_likert()
+        scores np.array(): output of likert_scores()
+        top_box int(): number of answers at each end of the scale for
+        the top and bottom box
+
+    :return:
+        dict(): arrays 'n', 'mean', 'median', 'top_box' and 'bottom_box'
+    """
+    n = counts.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (counts * scores).sum(axis=-1) / n
+        top = counts[..., -top_box:].sum(axis=-1) / n
+        bottom = counts[..., :top_box].sum(axis=-1) / n
+    # The median is the first answer where the cumulative count reaches half of the respondents
+    cumulative = counts.cumsum(axis=-1)
+    median_idx = (cumulative < (n[..., np.newaxis] / 2.)).sum(axis=-1)
+    median = np.where(n > 0, scores[np.minimum(median_idx, len(scores) - 1)], np.nan)
+    return {'n': n, 'mean': mean, 'median': median,
+            'top_box': top, 'bottom_box': bottom}
+
+
+def likert_summary(df, colnames, catalog, groupby=None, top_box=2, rename_columns=False, weights=None):
+    """
+    Statistics of a block of Likert questions
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the Likert columns
+        catalog list(): the ordered answers
+        groupby str(): optional column to split the respondents (country, gender, ...)
+        top_box int(): see summarise_counts()
+        rename_columns bool(): only keep the text between brackets as item name,
+        as count_unique_value() does
+        weights np.array(): optional weight of each respondent, 'n' is then
+        the sum of the weights
+
+    :return:
+        pd.df(): one row per item (per group and item if groupby), with the
+        columns 'n', 'mean', 'median', 'top_box' and 'bottom_box'
+    """
+    codes = encode_likert(df, colnames, catalog)
+    scores = likert_scores(catalog)
+    items = _item_names(colnames, rename_columns)
+
+    if groupby is None:
+        counts = count_likert(codes, len(catalog), weights=weights)
+        index = pd.Index(items)
+    else:
+        group_cat = pd.Categorical(df[groupby])
+        counts = count_likert(codes, len(catalog), np.asarray(group_cat.codes), len(group_cat.categories),
+                              weights)
+        index = pd.MultiIndex.from_product([group_cat.categories, items], names=[groupby, None])
+
+    stats = summarise_counts(counts, scores, top_box)
+    return pd.DataFrame({k: v.ravel() for k, v in stats.items()}, index=index,
+                        columns=['n', 'mean', 'median', 'top_box', 'bottom_box'])
+
+
+def likert_distribution(df, colnames, catalog, normalize=False, rename_columns=False, weights=None):
+    """
+    Count the answers of a block of Likert questions, with the answers as columns
+    in the order of the scale. The output can be passed directly to likert_scale()
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the Likert columns
+        catalog list(): the ordered answers
+        normalize bool(): return the ratio per item instead of the counts
+        rename_columns bool(): only keep the text between brackets as item name
+        weights np.array(): optional weight of each respondent
+
+    :return:
+        pd.df(): items as rows, answers as columns
+    """
+    counts = count_likert(encode_likert(df, colnames, catalog), len(catalog), weights=weights)
+    output = pd.DataFrame(counts, index=_item_names(colnames, rename_columns), columns=catalog)
+    if normalize:
+        output = output.div(output.sum(axis=1), axis=0)
+    return output
+
+
+def _item_names(colnames, rename_columns):
+    if rename_columns:
+        return [s.split('[', 1)[1].split(']')[0] if '[' in s else s for s in colnames]
+    return list(colnames)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Clustering of the near-duplicate answers of the open questions (job titles,
+organisations, skills, ...).
+Each distinct answer is split into character trigrams and summarised by a
+MinHash signature. The signatures are cut into bands, and the answers sharing
+a band are candidate pairs (locality-sensitive hashing), which avoids comparing
+all the pairs. The candidates are merged by decreasing estimated Jaccard
+similarity, and two groups are only merged if all their answers are above the
+threshold with each other (complete linkage), so different answers are not
+chained together through intermediate ones. Each group gets its most frequent
+answer, as typed by the respondents, as label.
+"""
+
+import zlib
+import pandas as pd
+import numpy as np
+
+from fuzzy_match import trigrams
+from heavy_hitters import normalise_text
+
+
+# Mersenne prime used for the universal hash functions (a * x + b) mod p
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+def get_hash_functions(num_perm=64, seed=1):
+    """
+    Random coefficients of the hash functions used for the signatures.
+    The same seed has to be used for signatures compared together
+    """
+    generator = np.random.RandomState(seed)
+    a = generator.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.int64)
+    b = generator.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.int64)
+    return a, b
+
+
+def minhash_signatures(values, num_perm=64, seed=1):
+    """
+    MinHash signature of each value, computed for all the values at once
+
+    :params:
+        values list(): the distinct answers
+        num_perm int(): number of hash functions, length of the signatures
+        seed int(): seed of the hash functions
+
+    :return:
+        np.array(): matrix values x num_perm. The values without
+        any trigram have a signature of MERSENNE_PRIME
+    """
+    a, b = get_hash_functions(num_perm, seed)
+    hashes = list()
+    owners = list()
+    for value_id, value in enumerate(values):
+        # crc32 is stable between runs, unlike hash()
+        grams = [zlib.crc32(g.encode('utf-8')) % MERSENNE_PRIME for g in trigrams(value)]
+        hashes.extend(grams)
+        owners.extend([value_id] * len(grams))
+    hashes = np.array(hashes, dtype=np.int64)
+    owners = np.array(owners, dtype=np.int64)
+
+    signatures = np.full((len(values), num_perm), MERSENNE_PRIME, dtype=np.int64)
+    if len(hashes) == 0:
+        return signatures
+    permuted = (a[:, np.newaxis] * hashes + b[:, np.newaxis]) % MERSENNE_PRIME
+    # The shingles are grouped by owner, reduce each segment to its minimum
+    starts = np.flatnonzero(np.concatenate([[True], owners[1:] != owners[:-1]]))
+    signatures[owners[starts]] = np.minimum.reduceat(permuted, starts, axis=1).T
+    return signatures
+
+
+def lsh_candidates(signatures, bands=16):
+    """
+    Pairs of values that share at least one band of their signature
+
+    :params:
+        signatures np.array(): output of minhash_signatures()
+        bands int(): number of bands, must divide the length of the signatures.
+        More bands find pairs with a lower similarity
+
+    :return:
+        set(): set of tuple (i, j) with i < j
+    """
+    n_values, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError('{} bands do not divide signatures of length {}'.format(bands, num_perm))
+    rows = num_perm // bands
+    candidates = set()
+    for band in range(bands):
+        buckets = dict()
+        band_signatures = signatures[:, band * rows:(band + 1) * rows]
+        for value_id in range(n_values):
+            buckets.setdefault(band_signatures[value_id].tobytes(), []).append(value_id)
+        for bucket in buckets.values():
+            for k, i in enumerate(bucket):
+                for j in bucket[k + 1:]:
+                    candidates.add((i, j))
+    return candidates
+
+
+def estimated_similarity(signatures, left, right):
+    """
+    Estimated Jaccard similarity between each value of left and each value of right
+
+    :params:
+        signatures np.array(): output of minhash_signatures()
+        left, right list(): ids of the values
+
+    :return:
+        np.array(): matrix len(left) x len(right)
+    """
+    return (signatures[left][:, np.newaxis, :] == signatures[right][np.newaxis, :, :]).mean(axis=2)
+
+
+def cluster_values(values, counts=None, threshold=0.6, num_perm=64, bands=16, seed=1):
+    """
+    Group the near-duplicate values
+
+    :params:
+        values list(): the distinct answers
+        counts list(): number of respondents for each value, used to choose the label
+        threshold float(): minimum estimated Jaccard similarity between all
+        the values of a group
+        num_perm int(): length of the signatures
+        bands int(): number of LSH bands
+        seed int(): seed of the hash functions
+
+    :return:
+        pd.df(): with the columns 'value', 'count', 'cluster' and 'label'
+    """
+    values = list(values)
+    if counts is None:
+        counts = [1] * len(values)
+    signatures = minhash_signatures(values, num_perm, seed)
+    empty = (signatures == MERSENNE_PRIME).all(axis=1)
+
+    pairs = [(i, j) for i, j in lsh_candidates(signatures, bands) if not (empty[i] or empty[j])]
+    similarities = [(signatures[i] == signatures[j]).mean() for i, j in pairs]
+    cluster_of = list(range(len(values)))
+    members = {i: [i] for i in range(len(values))}
+    # Most similar pairs first, the order of the pairs makes ties deterministic
+    for similarity, i, j in sorted(((sim, i, j) for sim, (i, j) in zip(similarities, pairs)),
+                                   key=lambda x: (-x[0], x[1], x[2])):
+        if similarity < threshold:
+            break
+        a, b = cluster_of[i], cluster_of[j]
+        if a == b:
+            continue
+        if estimated_similarity(signatures, members[a], members[b]).min() < threshold:
+            continue
+        for k in members[b]:
+            cluster_of[k] = a
+        members[a].extend(members.pop(b))
+
+    clusters = pd.DataFrame({'value': values,
+                             'count': counts,
+                             'cluster': cluster_of})
+    clusters['label'] = _cluster_labels(clusters)
+    # Renumber the clusters from 0
+    clusters['cluster'] = pd.factorize(clusters['cluster'])[0]
+    return clusters
+
+
+def _cluster_labels(clusters):
+    """
+    Label of each row: the most frequent value of its cluster, the shortest one in case of tie
+    """
+    order = clusters.assign(length=clusters['value'].astype(str).str.len())
+    order = order.sort_values(['count', 'length'], ascending=[False, True], kind='mergesort')
+    labels = order.drop_duplicates('cluster').set_index('cluster')['value']
+    return clusters['cluster'].map(labels)
+
+
+def cluster_column(serie, threshold=0.6, num_perm=64, bands=16, seed=1):
+    """
+    Cluster the answers of a column. The answers are normalised first,
+    so the answers only differing by case or punctuation are merged directly,
+    but the label is the most frequent answer as it was typed
+
+    :params:
+        serie pd.Series(): the column
+        others: see cluster_values()
+
+    :return:
+        pd.df(): one row per distinct raw answer, with the columns 'value',
+        'count', 'cluster' and 'label'
+    """
+    raw = serie.dropna().value_counts()
+    raw = pd.DataFrame({'value': raw.index, 'count': raw.values})
+    raw['key'] = raw['value'].map(normalise_text)
+    raw = raw.loc[raw['key'].notnull()]
+    keys = raw.groupby('key', sort=False)['count'].sum().sort_values(ascending=False, kind='mergesort')
+    clusters = cluster_values(keys.index.tolist(), keys.values.tolist(),
+                              threshold, num_perm, bands, seed)
+    raw['cluster'] = raw['key'].map(dict(zip(clusters['value'], clusters['cluster'])))
+    raw = raw.drop('key', axis=1).reset_index(drop=True)
+    raw['label'] = _cluster_labels(raw)
+    return raw[['value', 'count', 'cluster', 'label']]
+
+
+def get_recode_dict(clusters, only_changed=True):
+    """
+    Dictionary {value: label} to recode the column
+
+    :params:
+        clusters pd.df(): output of cluster_column() or cluster_values()
+        only_changed bool(): skip the values that are their own label
+    """
+    if only_changed:
+        clusters = clusters.loc[clusters['value'] != clusters['label']]
+    return dict(zip(clusters['value'], clusters['label']))
+
+
+def apply_clusters(df, colname, clusters, new_colname=None):
+    """
+    Replace the answers of a column by the label of their cluster
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colname str(): the column clustered with cluster_column()
+        clusters pd.df(): output of cluster_column()
+        new_colname str(): name of the created column. If None, the column is replaced
+
+    :return:
+        df pd.df(): the same dataframe with the recoded column, the answers
+        not in the clusters are kept as they are
+    """
+    if new_colname is None:
+        new_colname = colname
+    mapping = dict(zip(clusters['value'], clusters['label']))
+    recoded = df[colname].map(mapping)
+    df[new_colname] = recoded.where(recoded.notnull(), df[colname])
+    return df
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Analysis of the missing answers.
+The answered/unanswered state of each respondent is packed into a bit mask
+(np.packbits, one bit per column) so a row of 274 columns takes 35 bytes.
+The masks are used as keys of a hash group-by (pd.factorize) to count the
+distinct patterns of missing answers, and the unpacked matrix gives the
+completion per question, per section of the survey and per respondent,
+to choose which respondents to keep with a better criterion than 'Last page'.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+def answered_matrix(df, colnames=None):
+    """
+    Boolean matrix respondents x columns, True if the question is answered
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the columns, all of them if None
+
+    :return:
+        np.array(): the boolean matrix
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    return df[colnames].notnull().values
+
+
+def pack_rows(answered):
+    """
+    Pack each row of the boolean matrix into bytes
+
+    :return:
+        np.array(): matrix of uint8, respondents x ceil(columns / 8)
+    """
+    return np.packbits(np.asarray(answered, dtype=bool), axis=1)
+
+
+def count_patterns(packed, n_columns):
+    """
+    Count the distinct patterns of missing answers
+
+    :params:
+        packed np.array(): output of pack_rows()
+        n_columns int(): number of columns before packing
+
+    :return:
+        patterns np.array(): boolean matrix of the distinct patterns x columns
+        counts np.array(): number of respondents with each pattern
+        inverse np.array(): id of the pattern of each respondent
+    """
+    keys = [row.tobytes() for row in packed]
+    inverse, uniques = pd.factorize(pd.Series(keys, dtype=object))
+    counts = np.bincount(inverse, minlength=len(uniques))
+    # The width is explicit so an empty frame (no pattern) keeps its shape
+    unique_packed = np.frombuffer(b''.join(uniques), dtype=np.uint8).reshape(len(uniques), packed.shape[1])
+    patterns = np.unpackbits(unique_packed, axis=1, count=n_columns).astype(bool)
+    return patterns, counts, inverse
+
+
+def pattern_table(df, colnames=None, top=10):
+    """
+    Most frequent patterns of missing answers
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the columns, all of them if None
+        top int(): number of patterns
+
+    :return:
+        pd.df(): one row per pattern with the columns 'count', 'n_answered'
+        and 'missing' (list of the unanswered columns)
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    answered = answered_matrix(df, colnames)
+    patterns, counts, _ = count_patterns(pack_rows(answered), len(colnames))
+    order = np.argsort(-counts, kind='mergesort')[:top]
+    colnames = np.array(colnames, dtype=object)
+    return pd.DataFrame({'count': counts[order],
+                         'n_answered': patterns[order].sum(axis=1),
+                         'missing': [colnames[~patterns[i]].tolist() for i in order]})
+
+
+def question_completion(df, colnames=None):
+    """
+    Ratio of the respondents answering each question
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    return pd.Series(answered_matrix(df, colnames).mean(axis=0), index=colnames, name='completion')
+
+
+def section_completion(df, questions, mapping):
+    """
+    Completion of each section of the survey, per respondent
+
+    :params:
+        df pd.df(): dataframe containing the data
+        questions pd.df(): output of questions.load_questions()
+        mapping dict(): output of questions.map_columns_to_codes()
+
+    :return:
+        pd.df(): respondents x sections, ratio of the columns of the section answered
+    """
+    section_of_code = dict(zip(questions['code'], questions['section']))
+    colnames = [col for col in df.columns if mapping.get(col) in section_of_code]
+    sections = np.array([section_of_code[mapping[col]] for col in colnames])
+    answered = answered_matrix(df, colnames).astype(np.float32)
+    unique_sections = np.unique(sections)
+    # Indicator matrix columns x sections, the sum per section is a matrix product
+    indicator = (sections[:, np.newaxis] == unique_sections[np.newaxis, :]).astype(np.float32)
+    completion = answered.dot(indicator) / indicator.sum(axis=0)
+    return pd.DataFrame(completion, index=df.index, columns=unique_sections)
+
+
+def co_missingness(df, colnames=None):
+    """
+    Number of respondents missing both questions, for each pair of questions
+
+    :return:
+        pd.df(): square matrix columns x columns, the diagonal is the number
+        of respondents missing the question
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    missing = (~answered_matrix(df, colnames)).astype(np.float32)
+    counts = missing.T.dot(missing).round().astype(np.int64)
+    return pd.DataFrame(counts, index=colnames, columns=colnames)
+
+
+def completion_thresholds(df, colnames=None, thresholds=np.linspace(0, 1, 11)):
+    """
+    Number of respondents kept for different minimum completion ratios
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the columns, all of them if None
+        thresholds list(): the minimum ratios of questions answered
+
+    :return:
+        pd.df(): indexed by threshold with the columns 'kept' and 'ratio'
+    """
+    if colnames is None:
+        colnames = df.columns.tolist()
+    completion = answered_matrix(df, colnames).mean(axis=1)
+    # Number of respondents at or above each threshold from the sorted completions
+    kept = len(completion) - np.searchsorted(np.sort(completion), thresholds, side='left')
+    return pd.DataFrame({'kept': kept, 'ratio': kept / float(max(len(completion), 1))},
+                        index=pd.Index(thresholds, name='threshold'))
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv', index_col=0)
+    pd.set_option('display.max_rows', 300)
+    print(pattern_table(df, top=5)[['count', 'n_answered']])
+    print(completion_thresholds(df))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Storage and analysis of the multiple-choice questions.
+A multiple-choice question is exported as one column per option
+('... [Python]', '... [R]', ...) with 'Yes' when the option is selected and
+'No' or a missing value otherwise.
+Each question is stored as a bit matrix respondents x options, packed along the
+respondents with the same layout as the bitmaps of bitmap_index.py, so a segment
+bitmap can be applied directly. The option x option co-occurrence matrix is a
+matrix product computed by blocks of respondents, to keep the memory bounded.
+"""
+
+import pandas as pd
+import numpy as np
+
+from bitmap_index import POPCOUNT_TABLE
+
+
+def get_question_name(colname):
+    """
+    Text of the question without the option between brackets
+    """
+    return colname.rsplit('[', 1)[0].strip()
+
+
+def get_option_name(colname):
+    """
+    Text of the option between the last brackets
+    """
+    return colname.rsplit('[', 1)[1].split(']')[0]
+
+
+def is_multiple_choice(df, colnames, selected='Yes', not_selected=('No',)):
+    """
+    Check if a group of columns is a multiple-choice question: all
+    the columns only contain the `selected` value, the `not_selected`
+    values or missing values
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the columns of the group
+        selected str(): value for a selected option
+        not_selected tuple(): values for an option not selected
+    """
+    values = pd.unique(df[colnames].values.ravel())
+    return all(pd.isnull(v) or v == selected or v in not_selected for v in values)
+
+
+def build_multiple_choice(df, colnames, selected='Yes'):
+    """
+    Store a multiple-choice question as a packed bit matrix
+
+    :params:
+        df pd.df(): dataframe containing the data
+        colnames list(): the columns of the question, one per option
+        selected str(): value for a selected option
+
+    :return:
+        dict(): with the keys
+            'question' str(): the text of the question
+            'options' list(): the name of each option
+            'n_rows' int(): the number of respondents
+            'packed' np.array(): np.uint8 of shape (ceil(n_rows / 8), n_options)
+    """
+    selection = (df[colnames] == selected).values
+    return {'question': get_question_name(colnames[0]),
+            'options': [get_option_name(col) for col in colnames],
+            'n_rows': selection.shape[0],
+            'packed': np.packbits(selection, axis=0)}
+
+
+def find_multiple_choice(df, group_q, selected='Yes', not_selected=('No',)):
+    """
+    Build the bit matrices of all the multiple-choice questions
+    among the groups created by grouping_question()
+
+    :params:
+        df pd.df(): dataframe containing the data
+        group_q list(): list of list of columns
+        selected str(): value for a selected option
+        not_selected tuple(): values for an option not selected
+
+    :return:
+        dict(): the question as key and the output of build_multiple_choice() as value
+    """
+    questions = dict()
+    for group in group_q:
+        if is_multiple_choice(df, group, selected, not_selected):
+            mc = build_multiple_choice(df, group, selected)
+            questions[mc['question']] = mc
+    return questions
+
+
+def _apply_segment(mc, segment):
+    """
+    Keep only the respondents of the segment, a packed bitmap
+    as returned by bitmap_index.evaluate()
+    """
+    if segment is None:
+        return mc['packed']
+    return mc['packed'] & segment[:, np.newaxis]
+
+
+def selection_matrix(mc, segment=None):
+    """
+    Unpack the bit matrix into a boolean matrix respondents x options
+    """
+    packed = _apply_segment(mc, segment)
+    return np.unpackbits(packed, axis=0)[:mc['n_rows']].astype(bool)
+
+
+def option_counts(mc, segment=None, normalize=False):
+    """
+    Number of respondents that selected each option, as the popcount of each column
+
+    :params:
+        mc dict(): output of build_multiple_choice()
+        segment np.array(): optional packed bitmap of the respondents to count
+        normalize bool(): divide by the number of respondents that selected
+        at least one option
+
+    :return:
+        pd.Series(): the counts indexed by the options
+    """
+    packed = _apply_segment(mc, segment)
+    counts = pd.Series(POPCOUNT_TABLE[packed].sum(axis=0, dtype=np.int64),
+                       index=mc['options'], name=mc['question'])
+    if normalize:
+        answered = (selection_counts(mc, segment) > 0).sum()
+        return counts / answered if answered else counts.astype(float)
+    return counts
+
+
+def selection_counts(mc, segment=None):
+    """
+    Number of options selected by each respondent
+
+    :return:
+        np.array(): one value per respondent, 0 for the respondents out of the segment
+    """
+    return selection_matrix(mc, segment).sum(axis=1)
+
+
+def cooccurrence(mc, segment=None, block_size=65536):
+    """
+    Number of respondents that selected both options, for each pair of options.
+    The diagonal holds the option counts
+
+    :params:
+        mc dict(): output of build_multiple_choice()
+        segment np.array(): optional packed bitmap of the respondents to count
+        block_size int(): number of respondents unpacked at once, multiple of 8
+
+    :return:
+        pd.df(): options x options counts
+    """
+    packed = _apply_segment(mc, segment)
+    n_options = packed.shape[1]
+    result = np.zeros((n_options, n_options), dtype=np.float64)
+    step = block_size // 8
+    for start in range(0, packed.shape[0], step):
+        block = np.unpackbits(packed[start:start + step], axis=0).astype(np.float32)
+        result += block.T.dot(block)
+    return pd.DataFrame(result.astype(np.int64), index=mc['options'], columns=mc['options'])
+
+
+def count_multiple_choice(questions, segment=None, normalize=False):
+    """
+    Option counts of several multiple-choice questions
+
+    :params:
+        questions dict(): output of find_multiple_choice()
+        segment np.array(): optional packed bitmap of the respondents to count
+        normalize bool(): see option_counts()
+
+    :return:
+        dict(): question as key and the counts as value
+    """
+    return {q: option_counts(mc, segment, normalize) for q, mc in questions.items()}
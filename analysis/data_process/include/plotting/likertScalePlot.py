@@ -14,6 +14,8 @@ This script is an adaptation of the answers found:
 __author__ = 'Olivier PHILIPPE'
 __licence__ = 'BSD 3-clause'
 
+import os
+import sys
 import math
 import pandas as pd
 import numpy as np
@@ -28,6 +30,9 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 #  When using this script with ipython and vim
 plt.ion()
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from weighting import weighted_value_counts  # noqa: E402
 plt.show()
 
 
@@ -255,23 +260,37 @@ def likert_scale(df, normalise=True, labels=True, middle_line=True, legend=True,
     ax.set_xlabel('Distance')
 
 
-def count_unique_value(df, colnames, rename_columns=False, dropna=False, normalize=False):
+def count_unique_value(df, colnames, rename_columns=False, dropna=False, normalize=False, eligible=None,
+                       weights=None):
     """
     Count the values of different columns and transpose the count
     :params:
         :df pd.df(): dataframe containing the data
         :colnames list(): list of strings corresponding to the column header to select the right column
+        :eligible pd.Series(): boolean mask of the respondents shown the question,
+        the others are not counted (their NaN are not part of the denominator)
+        :weights pd.Series(): weight of each respondent (see include/weighting.py),
+        the counts are then the sum of the weights
     :return:
         :result_df pd.df(): dataframe with the count of each answer for each columns
     """
     # Subset the columns
+    if weights is not None:
+        weights = pd.Series(np.asarray(weights, dtype=float), index=df.index)
+    if eligible is not None:
+        df = df.loc[eligible]
+        if weights is not None:
+            weights = weights.loc[eligible]
     df_sub = df[colnames]
 
     if rename_columns is True:
         df_sub.columns = [s.split('[', 1)[1].split(']')[0] for s in colnames]
 
     # Calculate the counts for them
-    df_sub = df_sub.apply(pd.Series.value_counts, dropna=dropna, normalize=normalize)
+    if weights is not None:
+        df_sub = df_sub.apply(weighted_value_counts, weights=weights, dropna=dropna, normalize=normalize)
+    else:
+        df_sub = df_sub.apply(pd.Series.value_counts, dropna=dropna, normalize=normalize)
     # Transpose the column to row to be able to plot a stacked bar chart
     return df_sub.transpose()
 
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Link between the columns of the exported results and the questions
+defined in survey_creation/XX_17/XX_17.csv.
+The export uses the full text of the question as column name, sometimes with
+small differences from the text of the csv (punctuation, double spaces, the
+option between brackets), so the texts are normalised before being compared.
+The mapping is cached per header signature, as all the exports of a survey share
+the same header, and can be used to rename the columns with short names built
+from the codes ('time1can[Research]' instead of the full text of the question).
+"""
+
+import re
+import zlib
+import pandas as pd
+
+
+RE_NON_ALPHANUM = re.compile(r'[^a-z0-9]+')
+RE_LAST_BRACKET = re.compile(r'\s*\[[^\]]*\]\s*$')
+OTHER_RAW = '[OTHER_RAW]'
+
+# Mappings already computed, keyed by the signatures of the header and the questions
+_MAPPING_CACHE = dict()
+
+
+def load_questions(path_to_file):
+    """
+    Load the csv defining the questions of a survey
+
+    :params:
+        path_to_file str(): path to the csv (for instance survey_creation/uk_17/uk_17.csv)
+
+    :return:
+        pd.df(): one row per question, in the order of the survey
+    """
+    return pd.read_csv(path_to_file)
+
+
+def normalise_question(text):
+    """
+    Lower case text with only the letters and digits, to compare
+    the column names with the questions
+    """
+    return RE_NON_ALPHANUM.sub('', str(text).lower())
+
+
+def strip_item(colname):
+    """
+    Remove the option between brackets at the end of a column name
+    ('Question? [Python]' -> 'Question?')
+    """
+    return RE_LAST_BRACKET.sub('', colname)
+
+
+def _normalise_questions(questions):
+    return [(normalise_question(q), code)
+            for q, code in zip(questions['question'], questions['code'])]
+
+
+def _candidate_codes(col, normalised):
+    """
+    Codes of the questions matching a column
+
+    :return:
+        list(): a single code if the column is matched, several codes if
+        it is ambiguous, empty if no question matches
+    """
+    full_text = normalise_question(col)
+    text = normalise_question(strip_item(col))
+    if not text:
+        return []
+    exact = ([code for q, code in normalised if q == full_text] +
+             [code for q, code in normalised if q == text])
+    if exact:
+        return exact[:1]
+    # A prefix match is only accepted if it is unique. The text with the option
+    # is tried first, as the option can be what distinguishes the questions
+    candidates = list()
+    for t in (full_text, text):
+        candidates = [code for q, code in normalised
+                      if q and (t.startswith(q) or q.startswith(t))]
+        if len(candidates) == 1:
+            break
+    return candidates
+
+
+def map_columns_to_codes(columns, questions):
+    """
+    Find the code of the question for each column of the export.
+    A column matches a question if their normalised texts are equal, with or
+    without the option between brackets (some grouped questions of the export
+    are single questions in the csv), or if one starts with the other and no
+    other question does. The ambiguous columns are left out, see
+    get_ambiguous_columns(). The '[OTHER_RAW]' columns are not mapped
+
+    :params:
+        columns list(): column names of the export
+        questions pd.df(): output of load_questions()
+
+    :return:
+        dict(): column name as key and the code as value, only for the matched columns
+    """
+    normalised = _normalise_questions(questions)
+    mapping = dict()
+    for col in columns:
+        if col.startswith(OTHER_RAW):
+            continue
+        candidates = _candidate_codes(col, normalised)
+        if len(candidates) == 1:
+            mapping[col] = candidates[0]
+    return mapping
+
+
+def get_ambiguous_columns(columns, questions):
+    """
+    Columns left out by map_columns_to_codes() because they match several questions
+
+    :params:
+        columns list(): column names of the export
+        questions pd.df(): output of load_questions()
+
+    :return:
+        pd.df(): with the columns 'column' and 'candidates' (list of codes)
+    """
+    normalised = _normalise_questions(questions)
+    rows = list()
+    for col in columns:
+        if col.startswith(OTHER_RAW):
+            continue
+        candidates = _candidate_codes(col, normalised)
+        if len(candidates) > 1:
+            rows.append((col, candidates))
+    return pd.DataFrame(rows, columns=['column', 'candidates'])
+
+
+def get_columns_by_code(mapping):
+    """
+    Invert the output of map_columns_to_codes()
+
+    :return:
+        dict(): code as key and the list of its columns as value
+    """
+    columns_by_code = dict()
+    for col, code in mapping.items():
+        columns_by_code.setdefault(code, []).append(col)
+    return columns_by_code
+
+
+def get_signature(texts):
+    """
+    Signature of a list of texts (a header or the questions), stable between runs
+    """
+    return zlib.crc32('\n'.join(str(t) for t in texts).encode('utf-8'))
+
+
+def get_mapping(columns, questions):
+    """
+    Same as map_columns_to_codes() but the result is cached per header,
+    so the exports of the same survey only compute it once
+
+    :params:
+        columns list(): column names of the export
+        questions pd.df(): output of load_questions()
+
+    :return:
+        dict(): column name as key and the code as value. Do not modify it, it is shared
+    """
+    columns = list(columns)
+    key = (get_signature(columns),
+           get_signature(questions['code']),
+           get_signature(questions['question']))
+    if key not in _MAPPING_CACHE:
+        _MAPPING_CACHE[key] = map_columns_to_codes(columns, questions)
+    return _MAPPING_CACHE[key]
+
+
+def get_short_names(columns, mapping):
+    """
+    Short name of each column: the code of the question, followed by
+    the option between brackets if the question has several columns.
+    The '[OTHER_RAW]' columns keep their prefix and the columns without
+    code keep their name
+
+    :params:
+        columns list(): column names of the export
+        mapping dict(): output of map_columns_to_codes() or get_mapping()
+
+    :return:
+        dict(): column name as key and the short name as value
+    """
+    n_columns = pd.Series(list(mapping.values())).value_counts()
+    short_names = dict()
+    for col in columns:
+        prefix = ''
+        text = col
+        if col.startswith(OTHER_RAW):
+            prefix = OTHER_RAW + ' '
+            text = col[len(OTHER_RAW):].strip()
+        code = mapping.get(text)
+        if code is None:
+            short_names[col] = col
+        elif n_columns[code] == 1:
+            short_names[col] = prefix + code
+        else:
+            item = RE_LAST_BRACKET.search(text)
+            item = item.group(0).strip() if item else ''
+            short_names[col] = prefix + code + item
+    return short_names
+
+
+def rename_to_codes(df, questions):
+    """
+    Rename the columns of the dataframe with their short names
+
+    :params:
+        df pd.df(): dataframe containing the data
+        questions pd.df(): output of load_questions()
+
+    :return:
+        df pd.df(): the renamed dataframe
+        short_names dict(): column name as key and the short name as value,
+        to rename to_plot.json with rename_type_questions()
+    """
+    short_names = get_short_names(df.columns, get_mapping(df.columns, questions))
+    return df.rename(columns=short_names), short_names
+
+
+def rename_type_questions(type_questions, short_names):
+    """
+    Replace the column names of the content of to_plot.json
+    by their short names, keeping the same structure
+    """
+    if isinstance(type_questions, dict):
+        return {k: rename_type_questions(v, short_names) for k, v in type_questions.items()}
+    if isinstance(type_questions, list):
+        return [rename_type_questions(v, short_names) for v in type_questions]
+    return short_names.get(type_questions, type_questions)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Aggregation of the ranking questions (such as prevEmp2/decision_job).
+LimeSurvey exports a ranking question as one column per rank ('... [Rank 1]',
+'... [Rank 2]', ...) containing the text of the option. These columns are
+converted into a matrix respondents x options holding the rank given to each
+option (0 when the option is not ranked), on which the Borda score, the mean rank,
+the share of first places and the pairwise preferences are computed for all the
+options, and all the groups of respondents, at once.
+"""
+
+import re
+import pandas as pd
+import numpy as np
+
+
+def get_rank_columns(colnames):
+    """
+    Return the columns of a ranking question sorted by their rank number
+
+    :params:
+        colnames list(): columns of the question, ending with '[Rank X]'
+
+    :return:
+        list(): the columns sorted by rank
+    """
+    def rank_number(col):
+        match = re.search(r'\[Rank (\d+)\]\s*$', col)
+        if match is None:
+            raise ValueError('The column {} is not a rank column'.format(col))
+        return int(match.group(1))
+    return sorted(colnames, key=rank_number)
+
+
+def get_options(df, rank_columns):
+    """
+    Options found in the ranking columns, used when the catalog is not available
+    """
+    values = pd.unique(df[rank_columns].values.ravel())
+    return sorted(v for v in values if not pd.isnull(v))
+
+
+def rank_matrix(df, rank_columns, options):
+    """
+    Convert the rank columns into a matrix respondents x options
+
+    :params:
+        df pd.df(): dataframe containing the data
+        rank_columns list(): the columns of the question sorted by rank,
+        see get_rank_columns()
+        options list(): the possible options (the catalog of the question).
+        The values that are not in it are ignored
+
+    :return:
+        np.array(): matrix of np.int16 with the rank of each option, 0 if not ranked
+    """
+    codes = np.column_stack([pd.Categorical(df[col], categories=options).codes
+                             for col in rank_columns])
+    ranks = np.zeros((codes.shape[0], len(options)), dtype=np.int16)
+    respondent, position = np.nonzero(codes >= 0)
+    ranks[respondent, codes[respondent, position]] = position + 1
+    return ranks
+
+
+def _group_codes(df, groupby):
+    """
+    Integer code of the group of each respondent, all the respondents
+    are in the same group if groupby is None
+    """
+    if groupby is None:
+        return np.zeros(len(df.index), dtype=np.int64), [None]
+    cat = pd.Categorical(df[groupby])
+    return np.asarray(cat.codes, dtype=np.int64), cat.categories.tolist()
+
+
+def ranking_scores(ranks, groups, n_groups, n_ranks=None):
+    """
+    Compute the scores of each option for each group
+
+    :params:
+        ranks np.array(): output of rank_matrix()
+        groups np.array(): group code of each respondent, -1 to exclude
+        n_groups int(): number of groups
+        n_ranks int(): number of rank positions in the question, the Borda
+        score of a first place is n_ranks. By default the number of options
+
+    :return:
+        dict(): arrays of shape (n_groups, n_options) 'n_ranked', 'borda',
+        'mean_rank', 'first_share', and of shape (n_groups,) 'respondents'
+    """
+    n_options = ranks.shape[1]
+    if n_ranks is None:
+        n_ranks = n_options
+    ranked = ranks > 0
+    # Only the respondents that ranked at least one option are counted
+    answered = ranked.any(axis=1) & (groups >= 0)
+    ranks, ranked, groups = ranks[answered], ranked[answered], groups[answered]
+
+    keys = (groups[:, np.newaxis] * n_options + np.arange(n_options)).ravel()
+    size = n_groups * n_options
+
+    def grouped_sum(values):
+        return np.bincount(keys, weights=values.ravel(), minlength=size).reshape(n_groups, n_options)
+
+    n_ranked = grouped_sum(ranked).astype(np.int64)
+    borda = grouped_sum(np.where(ranked, n_ranks - ranks + 1, 0)).astype(np.int64)
+    sum_rank = grouped_sum(ranks)
+    first = grouped_sum(ranks == 1)
+    respondents = np.bincount(groups, minlength=n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_rank = sum_rank / n_ranked
+        first_share = first / respondents[:, np.newaxis]
+    return {'respondents': respondents,
+            'n_ranked': n_ranked,
+            'borda': borda,
+            'mean_rank': mean_rank,
+            'first_share': first_share}
+
+
+def pairwise_preferences(ranks, groups, n_groups):
+    """
+    Number of respondents preferring the option a to the option b, for each group.
+    An option is preferred if it is ranked better, or if it is ranked and the other is not
+
+    :params:
+        ranks np.array(): output of rank_matrix()
+        groups np.array(): group code of each respondent, -1 to exclude
+        n_groups int(): number of groups
+
+    :return:
+        np.array(): of shape (n_groups, n_options, n_options)
+    """
+    keep = groups >= 0
+    ranks, groups = ranks[keep], groups[keep]
+    effective = np.where(ranks > 0, ranks, np.iinfo(np.int16).max)
+    prefer = effective[:, :, np.newaxis] < effective[:, np.newaxis, :]
+    one_hot = groups[:, np.newaxis] == np.arange(n_groups)
+    return np.einsum('rg,rab->gab', one_hot.astype(np.int64), prefer.astype(np.int64))
+
+
+def ranking_summary(df, rank_columns, options=None, groupby=None):
+    """
+    Summary of one ranking question, per option (and per group)
+
+    :params:
+        df pd.df(): dataframe containing the data
+        rank_columns list(): columns of the question
+        options list(): catalog of the options. If None, the options found in the data
+        groupby str(): optional column to split the respondents
+
+    :return:
+        pd.df(): one row per option (per group and option if groupby), with the
+        columns 'n_ranked', 'borda', 'mean_rank' and 'first_share'
+    """
+    rank_columns = get_rank_columns(rank_columns)
+    if options is None:
+        options = get_options(df, rank_columns)
+    ranks = rank_matrix(df, rank_columns, options)
+    groups, group_names = _group_codes(df, groupby)
+    scores = ranking_scores(ranks, groups, len(group_names), len(rank_columns))
+
+    if groupby is None:
+        index = pd.Index(options)
+    else:
+        index = pd.MultiIndex.from_product([group_names, options], names=[groupby, None])
+    columns = ['n_ranked', 'borda', 'mean_rank', 'first_share']
+    return pd.DataFrame({k: scores[k].ravel() for k in columns}, index=index, columns=columns)
+
+
+def preference_table(df, rank_columns, options=None, groupby=None, normalize=False):
+    """
+    Pairwise preference matrix of one ranking question
+
+    :params:
+        df pd.df(): dataframe containing the data
+        rank_columns list(): columns of the question
+        options list(): catalog of the options. If None, the options found in the data
+        groupby str(): optional column to split the respondents
+        normalize bool(): divide by the number of respondents that ranked at least one option
+
+    :return:
+        pd.df(): options as rows and columns, the cell (a, b) is the number of
+        respondents preferring a to b. Indexed by (group, option) if groupby
+    """
+    rank_columns = get_rank_columns(rank_columns)
+    if options is None:
+        options = get_options(df, rank_columns)
+    ranks = rank_matrix(df, rank_columns, options)
+    groups, group_names = _group_codes(df, groupby)
+    groups = np.where((ranks > 0).any(axis=1), groups, -1)
+    prefs = pairwise_preferences(ranks, groups, len(group_names)).astype(float)
+    if normalize:
+        respondents = np.bincount(groups[groups >= 0], minlength=len(group_names))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            prefs = prefs / respondents[:, np.newaxis, np.newaxis]
+
+    if groupby is None:
+        return pd.DataFrame(prefs[0], index=options, columns=options)
+    index = pd.MultiIndex.from_product([group_names, options], names=[groupby, None])
+    return pd.DataFrame(prefs.reshape(-1, len(options)), index=index, columns=options)
+
+
+def summarise_rankings(df, ranking_questions, catalogs=None, groupby=None):
+    """
+    Summary of all the ranking questions of a survey
+
+    :params:
+        df pd.df(): dataframe containing the data
+        ranking_questions dict(): name of the question as key and the list
+        of its rank columns as value (for instance the 'decision_job' entry of to_plot.json)
+        catalogs dict(): name of the question as key and the options as value
+        groupby str(): optional column to split the respondents
+
+    :return:
+        dict(): name of the question as key, output of ranking_summary() as value
+    """
+    if catalogs is None:
+        catalogs = dict()
+    return {name: ranking_summary(df, columns, catalogs.get(name), groupby)
+            for name, columns in ranking_questions.items()}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Loader of the raw limesurvey exports (raw_results-surveyXXXXXX.csv).
+Only the header is read first, the columns to keep and their dtypes are
+derived from it and from the questions csv, and passed to pd.read_csv() so
+the columns dropped later by dropping_lime_useless() (metadata, 'Question time'
+and 'Group time') are never parsed, and the answers of the questions with a
+catalog are read directly as categoricals.
+The multithreaded csv reader of pyarrow is used if it is installed, except
+for the exports with duplicated column names, which pyarrow cannot select.
+"""
+
+import pandas as pd
+
+from questions import get_mapping
+
+try:
+    import pyarrow  # noqa: F401
+    DEFAULT_ENGINE = 'pyarrow'
+except ImportError:
+    DEFAULT_ENGINE = 'c'
+
+
+# Same columns as dropping_lime_useless()
+LIME_COLUMNS = ('Response ID', 'Date submitted', 'Start language',
+                'Date started', 'Date last action', 'Referrer URL')
+TIMING_PATTERNS = ('Question time', 'Group time')
+
+
+def read_header(path_to_file):
+    """
+    Read only the column names of a csv, the duplicated names get
+    a suffix ('X', 'X.1', ...) as in pd.read_csv()
+    """
+    return pd.read_csv(path_to_file, nrows=0).columns.tolist()
+
+
+def has_duplicated_names(path_to_file):
+    """
+    True if some column names of a csv are repeated
+    """
+    names = pd.read_csv(path_to_file, nrows=1, header=None, dtype=str).iloc[0]
+    return bool(names.duplicated().any())
+
+
+def get_usecols(header, keep_timings=False):
+    """
+    Columns of the export to load
+
+    :params:
+        header list(): column names of the export
+        keep_timings bool(): keep the 'Question time' and 'Group time' columns
+
+    :return:
+        list(): the column names, in the order of the header
+    """
+    usecols = list()
+    for col in header:
+        if col in LIME_COLUMNS:
+            continue
+        if not keep_timings and any(p in col for p in TIMING_PATTERNS):
+            continue
+        usecols.append(col)
+    return usecols
+
+
+def get_dtypes(columns, questions):
+    """
+    Categorical dtype for the columns of the questions with an answer_file.
+    The categories are inferred from the data and not taken from the catalog,
+    so the values not in the catalog are not lost
+
+    :params:
+        columns list(): the columns to load
+        questions pd.df(): output of questions.load_questions()
+
+    :return:
+        dict(): column name as key and 'category' as value
+    """
+    with_catalog = set(questions.loc[questions['answer_file'].notnull(), 'code'])
+    mapping = get_mapping(columns, questions)
+    return {col: 'category' for col, code in mapping.items()
+            if code in with_catalog and not col.rstrip().endswith('[Other]')}
+
+
+def load_raw_export(path_to_file, questions=None, keep_timings=False, engine=DEFAULT_ENGINE):
+    """
+    Load a raw export with only the needed columns
+
+    :params:
+        path_to_file str(): path to the export
+        questions pd.df(): output of questions.load_questions(), to read the
+        answers with a catalog as categoricals. If None, the dtypes are inferred
+        keep_timings bool(): keep the 'Question time' and 'Group time' columns
+        engine str(): engine of pd.read_csv(), 'pyarrow' if installed (Default) or 'c'.
+        pyarrow also converts the columns of dates into datetime. 'c' is used
+        instead of pyarrow if the header has duplicated names
+
+    :return:
+        pd.df(): the export without the limesurvey columns
+    """
+    header = read_header(path_to_file)
+    usecols = get_usecols(header, keep_timings)
+    dtypes = get_dtypes(usecols, questions) if questions is not None else None
+    # pyarrow only sees the names of the file, not the suffixed ones of pandas
+    if engine == 'pyarrow' and has_duplicated_names(path_to_file):
+        engine = 'c'
+    df = pd.read_csv(path_to_file, usecols=usecols, dtype=dtypes, engine=engine)
+    # pyarrow does not keep the order of usecols
+    return df[usecols]
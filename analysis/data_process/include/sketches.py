@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Mergeable summaries of the discrete numerical questions (years of experience,
+duration of the contract, total time, ...).
+For each question, and each country, a summary keeps the count, sum, min and max,
+a histogram with fixed bins and a KLL sketch for the quantiles. The summaries are
+updated chunk by chunk without keeping the raw values, and the summaries of several
+countries can be merged to get the pooled distribution.
+
+KLL sketch: Karnin, Lang and Liberty, Optimal Quantile Approximation in Streams, 2016
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+
+def kll_create(k=200):
+    """
+    Create an empty KLL sketch
+
+    :params:
+        k int(): size of the top compactor. The rank error is about 1.7/k
+
+    :return:
+        dict(): the sketch
+    """
+    return {'k': k, 'n': 0, 'levels': [np.empty(0)]}
+
+
+def _capacity(k, height, level):
+    # The compactors get smaller by a factor 2/3 going down from the top level
+    return max(2, int(np.ceil(k * (2. / 3.) ** (height - level - 1))))
+
+
+def _compress(sketch):
+    """
+    Compact the levels exceeding their capacity: sort the level, keep
+    one item out of two (random offset) and promote them to the next level
+    """
+    levels = sketch['levels']
+    level = 0
+    while level < len(levels):
+        if len(levels[level]) >= _capacity(sketch['k'], len(levels), level):
+            if level + 1 == len(levels):
+                levels.append(np.empty(0))
+            items = np.sort(levels[level])
+            # Keep the last item at this level if the number of items is odd
+            if len(items) % 2:
+                items, levels[level] = items[:-1], items[-1:]
+            else:
+                levels[level] = np.empty(0)
+            offset = np.random.randint(2)
+            levels[level + 1] = np.concatenate([levels[level + 1], items[offset::2]])
+        level += 1
+    return sketch
+
+
+def kll_update(sketch, values):
+    """
+    Add an array of values to the sketch
+
+    :params:
+        sketch dict(): output of kll_create()
+        values np.array(): values to add, without missing values
+    """
+    values = np.asarray(values, dtype=float)
+    k = sketch['k']
+    # Add by batches of k values to keep level 0 bounded
+    for start in range(0, len(values), k):
+        sketch['levels'][0] = np.concatenate([sketch['levels'][0], values[start:start + k]])
+        _compress(sketch)
+    sketch['n'] += len(values)
+    return sketch
+
+
+def kll_merge(sketch1, sketch2):
+    """
+    Merge two sketches into a new one
+    """
+    k = max(sketch1['k'], sketch2['k'])
+    height = max(len(sketch1['levels']), len(sketch2['levels']))
+    levels = list()
+    for h in range(height):
+        parts = [s['levels'][h] for s in (sketch1, sketch2) if h < len(s['levels'])]
+        levels.append(np.concatenate(parts))
+    merged = {'k': k, 'n': sketch1['n'] + sketch2['n'], 'levels': levels}
+    return _compress(merged)
+
+
+def _weighted_items(sketch):
+    """
+    All the items sorted, with their weight 2^level
+    """
+    items = np.concatenate(sketch['levels'])
+    weights = np.concatenate([np.full(len(l), 2. ** h) for h, l in enumerate(sketch['levels'])])
+    order = np.argsort(items, kind='mergesort')
+    return items[order], weights[order]
+
+
+def kll_quantiles(sketch, quantiles):
+    """
+    Approximate quantiles from the sketch
+
+    :params:
+        sketch dict(): the sketch
+        quantiles list(): values between 0 and 1
+
+    :return:
+        np.array(): the quantiles, nan if the sketch is empty
+    """
+    quantiles = np.atleast_1d(quantiles)
+    items, weights = _weighted_items(sketch)
+    if len(items) == 0:
+        return np.full(len(quantiles), np.nan)
+    cumulative = np.cumsum(weights) / weights.sum()
+    idx = np.searchsorted(cumulative, quantiles, side='left')
+    return items[np.minimum(idx, len(items) - 1)]
+
+
+def kll_cdf(sketch, values):
+    """
+    Approximate share of the values lower or equal to each of `values`
+    """
+    items, weights = _weighted_items(sketch)
+    if len(items) == 0:
+        return np.full(len(np.atleast_1d(values)), np.nan)
+    cumulative = np.concatenate([[0], np.cumsum(weights)]) / weights.sum()
+    return cumulative[np.searchsorted(items, values, side='right')]
+
+
+def histogram_create(edges):
+    """
+    Histogram with fixed bins. Two extra bins count the values below the
+    first edge and above the last edge
+
+    :params:
+        edges list(): the edges of the bins, closed on the left
+    """
+    return {'edges': np.asarray(edges, dtype=float),
+            'counts': np.zeros(len(edges) + 1, dtype=np.int64)}
+
+
+def histogram_update(histogram, values):
+    idx = np.searchsorted(histogram['edges'], values, side='right')
+    histogram['counts'] += np.bincount(idx, minlength=len(histogram['counts']))
+    return histogram
+
+
+def histogram_merge(histogram1, histogram2):
+    if not np.array_equal(histogram1['edges'], histogram2['edges']):
+        raise ValueError('Cannot merge histograms with different bins')
+    return {'edges': histogram1['edges'].copy(),
+            'counts': histogram1['counts'] + histogram2['counts']}
+
+
+def create_summary(edges=None, k=200):
+    """
+    Create an empty summary for a numerical question
+
+    :params:
+        edges list(): edges of the histogram. If None, no histogram is kept
+        k int(): size of the KLL sketch, see kll_create()
+    """
+    return {'count': 0, 'missing': 0, 'sum': 0., 'sum_sq': 0.,
+            'min': np.inf, 'max': -np.inf,
+            'kll': kll_create(k),
+            'histogram': histogram_create(edges) if edges is not None else None}
+
+
+def update_summary(summary, serie):
+    """
+    Add the values of a column to the summary. The values that
+    cannot be converted into numbers are counted as missing
+
+    :params:
+        summary dict(): output of create_summary()
+        serie pd.Series(): values to add
+    """
+    values = pd.to_numeric(serie, errors='coerce').values.astype(float)
+    missing = np.isnan(values)
+    values = values[~missing]
+    summary['missing'] += int(missing.sum())
+    if len(values) == 0:
+        return summary
+    summary['count'] += len(values)
+    summary['sum'] += values.sum()
+    summary['sum_sq'] += (values ** 2).sum()
+    summary['min'] = min(summary['min'], values.min())
+    summary['max'] = max(summary['max'], values.max())
+    kll_update(summary['kll'], values)
+    if summary['histogram'] is not None:
+        histogram_update(summary['histogram'], values)
+    return summary
+
+
+def merge_summaries(summaries):
+    """
+    Merge a list of summaries of the same question into one
+
+    :params:
+        summaries list(): list of summaries
+
+    :return:
+        dict(): the merged summary
+    """
+    merged = summaries[0]
+    for summary in summaries[1:]:
+        histogram = None
+        if merged['histogram'] is not None and summary['histogram'] is not None:
+            histogram = histogram_merge(merged['histogram'], summary['histogram'])
+        merged = {'count': merged['count'] + summary['count'],
+                  'missing': merged['missing'] + summary['missing'],
+                  'sum': merged['sum'] + summary['sum'],
+                  'sum_sq': merged['sum_sq'] + summary['sum_sq'],
+                  'min': min(merged['min'], summary['min']),
+                  'max': max(merged['max'], summary['max']),
+                  'kll': kll_merge(merged['kll'], summary['kll']),
+                  'histogram': histogram}
+    return merged
+
+
+def summarise_questions(df, questions, groupby=None, summaries=None, edges=None, k=200):
+    """
+    Update the summaries of several questions with a chunk of data.
+    Can be called on each chunk of pd.read_csv(chunksize=...)
+
+    :params:
+        df pd.df(): the chunk of data
+        questions list(): the numerical columns to summarise
+        groupby str(): optional column to split the respondents (the country)
+        summaries dict(): the summaries from the previous chunks, None for the first one
+        edges dict(): question as key and the edges of its histogram as value
+        k int(): size of the KLL sketch
+
+    :return:
+        dict(): (question, group) as key and the summary as value. The group is
+        None if groupby is None
+    """
+    if summaries is None:
+        summaries = dict()
+    if edges is None:
+        edges = dict()
+    if groupby is None:
+        groups = [(None, df)]
+    else:
+        groups = df.groupby(groupby)
+    for group, sub_df in groups:
+        for q in questions:
+            key = (q, group)
+            if key not in summaries:
+                summaries[key] = create_summary(edges.get(q), k)
+            update_summary(summaries[key], sub_df[q])
+    return summaries
+
+
+def pool_summaries(summaries, question):
+    """
+    Merge the summaries of all the groups (countries) for a question
+    """
+    return merge_summaries([s for (q, _), s in summaries.items() if q == question])
+
+
+def describe_summary(summary, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Statistics of a summary
+
+    :return:
+        pd.Series(): count, mean, std, min, quantiles and max
+    """
+    n = summary['count']
+    output = {'count': n, 'missing': summary['missing']}
+    if n:
+        mean = summary['sum'] / n
+        output['mean'] = mean
+        output['std'] = np.sqrt(max(summary['sum_sq'] / n - mean ** 2, 0.) * n / max(n - 1, 1))
+        output['min'] = summary['min']
+        output['max'] = summary['max']
+    for q, value in zip(quantiles, kll_quantiles(summary['kll'], quantiles)):
+        output['{:.0%}'.format(q)] = value
+    return pd.Series(output)
+
+
+def summary_table(summaries, quantiles=(0.25, 0.5, 0.75)):
+    """
+    Describe all the summaries in one dataframe indexed by (question, group)
+    """
+    table = pd.DataFrame({key: describe_summary(s, quantiles) for key, s in summaries.items()}).T
+    table.index.names = ['question', 'group']
+    return table
+
+
+def histogram_table(summary):
+    """
+    Counts of the histogram of a summary indexed by the bins
+    """
+    edges = summary['histogram']['edges']
+    labels = (['<{}'.format(edges[0])] +
+              ['[{}, {})'.format(a, b) for a, b in zip(edges[:-1], edges[1:])] +
+              ['>={}'.format(edges[-1])])
+    return pd.Series(summary['histogram']['counts'], index=labels)
+
+
+def save_summaries(summaries, output_location):
+    """
+    Write the summaries into a json file, to update them with later runs
+    """
+    def to_json(summary):
+        output = dict(summary)
+        output['kll'] = {'k': summary['kll']['k'], 'n': summary['kll']['n'],
+                         'levels': [l.tolist() for l in summary['kll']['levels']]}
+        if summary['histogram'] is not None:
+            output['histogram'] = {'edges': summary['histogram']['edges'].tolist(),
+                                   'counts': summary['histogram']['counts'].tolist()}
+        for key in ['min', 'max', 'sum', 'sum_sq']:
+            output[key] = float(summary[key])
+        return output
+
+    to_write = [{'question': q, 'group': g, 'summary': to_json(s)} for (q, g), s in summaries.items()]
+    with open(output_location, 'w') as f:
+        json.dump(to_write, f)
+
+
+def load_summaries(input_location):
+    """
+    Load the summaries written by save_summaries()
+    """
+    with open(input_location, 'r') as f:
+        content = json.load(f)
+    summaries = dict()
+    for entry in content:
+        summary = entry['summary']
+        summary['kll']['levels'] = [np.array(l, dtype=float) for l in summary['kll']['levels']]
+        if summary['histogram'] is not None:
+            summary['histogram'] = {'edges': np.array(summary['histogram']['edges']),
+                                    'counts': np.array(summary['histogram']['counts'], dtype=np.int64)}
+        summaries[(entry['question'], entry['group'])] = summary
+    return summaries
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Skip logic of the survey, from the `conditional` column of the questions csv
+('if YES to open01can', 'If ‘University’ at currentEmp1', 'if other at the previous one',
+'if edu1' for the respondents who answered edu1).
+Each condition is parsed once into a rule (question referred, operator, value),
+then evaluated on the encoded answers of that question: the rule is tested on
+the few categories and the codes are looked up with np.isin(), giving a boolean
+mask of the respondents who were shown the question. A question is only shown
+if its parent question was shown as well, so the masks are chained.
+The masks are computed once per dataset and passed to the aggregation
+functions to use the eligible respondents as denominator instead of all the
+respondents.
+The conditions not referring to a code of the survey ('if qualification',
+'conf2_can') are given by DEFAULT_RULES, and a condition referring to an
+unknown code raises a warning, as it is most likely a typo in the csv.
+"""
+
+import re
+import warnings
+import pandas as pd
+import numpy as np
+
+from encoding import encode_column
+
+
+RE_YES_NO = re.compile(r"^if\s+(yes|no)\s+(?:to|at)\s+(\S+)$", re.IGNORECASE)
+RE_QUOTED = re.compile(r"^if\s+(not\s+)?[‘'\"](.+?)[’'\"]\s+(?:to|at)\s+(\S+)$", re.IGNORECASE)
+RE_OTHER = re.compile(r"^if\s+others?\s+(?:to|at)\s+(the\s+previous\s+one|\S+)$", re.IGNORECASE)
+RE_ANSWERED = re.compile(r"^if\s+(?:answered\s+(?:to\s+|at\s+)?)?(\S+)$", re.IGNORECASE)
+
+# Rules of the conditions written in words instead of referring to a code
+DEFAULT_RULES = {
+    # 'if qualification': the subject is asked to the respondents having a qualification
+    'edu2': {'code': 'edu1', 'op': 'not_startswith', 'value': 'none'},
+    # 'conf2_can': the conferences are asked to the respondents who presented their work
+    'conf2can': {'code': 'conf1can', 'op': 'startswith', 'value': 'yes'}}
+
+
+def parse_condition(text, previous_code=None):
+    """
+    Parse the text of a condition into a rule
+
+    :params:
+        text str(): content of the `conditional` column
+        previous_code str(): code of the question before, for 'the previous one'
+
+    :return:
+        dict(): with the keys 'code' (question referred), 'op' ('startswith',
+        'not_startswith', 'other' or 'answered') and 'value', None if the text
+        is not understood
+    """
+    text = str(text).strip()
+    match = RE_YES_NO.match(text)
+    if match:
+        return {'code': match.group(2), 'op': 'startswith', 'value': match.group(1)}
+    match = RE_QUOTED.match(text)
+    if match:
+        op = 'not_startswith' if match.group(1) else 'startswith'
+        return {'code': match.group(3), 'op': op, 'value': match.group(2)}
+    match = RE_OTHER.match(text)
+    if match:
+        code = match.group(1)
+        if code.lower().startswith('the'):
+            code = previous_code
+        return {'code': code, 'op': 'other', 'value': 'other'}
+    match = RE_ANSWERED.match(text)
+    if match:
+        return {'code': match.group(1), 'op': 'answered', 'value': None}
+    return None
+
+
+def get_rules(questions, rules=None):
+    """
+    Parse the conditions of all the questions
+
+    :params:
+        questions pd.df(): output of questions.load_questions()
+        rules dict(): code as key and the rule as value, to replace the rules
+        of the conditions that cannot be parsed. Applied after DEFAULT_RULES
+
+    :return:
+        rules dict(): code as key and the rule as value, for the parsed conditions
+        unresolved list(): (code, condition) of the conditions not parsed
+    """
+    parsed = dict()
+    unresolved = list()
+    previous_code = None
+    for code, condition in zip(questions['code'], questions['conditional']):
+        if pd.notnull(condition):
+            rule = parse_condition(condition, previous_code)
+            if rule is None:
+                unresolved.append((code, condition))
+            else:
+                parsed[code] = rule
+        previous_code = code
+    all_rules = dict(DEFAULT_RULES)
+    if rules is not None:
+        all_rules.update(rules)
+    parsed.update(all_rules)
+    unresolved = [(code, condition) for code, condition in unresolved if code not in all_rules]
+    return parsed, unresolved
+
+
+def _main_column(columns):
+    """
+    Column holding the answer of a question, not its '[Other]' field
+    """
+    for col in columns:
+        if not col.endswith('[Other]'):
+            return col
+    return columns[0]
+
+
+def evaluate_rule(df, rule, columns):
+    """
+    Evaluate a rule on the answers of the question it refers to
+
+    :params:
+        df pd.df(): dataframe containing the data
+        rule dict(): output of parse_condition()
+        columns list(): the columns of the question referred
+
+    :return:
+        np.array(): boolean mask of the respondents meeting the condition
+    """
+    codes, categories = encode_column(df[_main_column(columns)])
+    if rule['op'] == 'answered':
+        return codes >= 0
+    value = rule['value'].lower()
+    labels = [str(c).strip().lower() for c in categories]
+    if rule['op'] == 'startswith':
+        selected = [i for i, c in enumerate(labels) if c.startswith(value)]
+    elif rule['op'] == 'not_startswith':
+        selected = [i for i, c in enumerate(labels) if not c.startswith(value)]
+    elif rule['op'] == 'other':
+        selected = [i for i, c in enumerate(labels) if c.startswith('other')]
+    else:
+        raise ValueError('Unknown operator: {}'.format(rule['op']))
+    mask = np.isin(codes, selected)
+    if rule['op'] == 'other':
+        # The 'Other' text can be typed in a separated column
+        for col in columns:
+            if col.endswith('[Other]'):
+                mask |= df[col].notnull().values
+    return mask
+
+
+def eligibility_masks(df, questions, columns_by_code, rules=None):
+    """
+    Mask of the respondents who were shown each question
+
+    :params:
+        df pd.df(): dataframe containing the data
+        questions pd.df(): output of questions.load_questions()
+        columns_by_code dict(): output of questions.get_columns_by_code()
+        rules dict(): rules replacing or completing the parsed conditions,
+        see get_rules()
+
+    :return:
+        masks pd.df(): one boolean column per code present in the data,
+        True for the respondents eligible to the question
+        unresolved pd.df(): the conditions that could not be applied, with
+        the columns 'code', 'condition' and 'reason'. These questions are
+        considered shown to everyone
+    """
+    parsed, unresolved = get_rules(questions, rules)
+    unresolved = [(code, condition, 'not parsed') for code, condition in unresolved]
+    masks = dict()
+    all_rows = np.ones(len(df), dtype=bool)
+    known_codes = set(questions['code'])
+    # The survey order guarantees the parent question is evaluated first
+    for code, condition in zip(questions['code'], questions['conditional']):
+        if code not in columns_by_code:
+            continue
+        rule = parsed.get(code)
+        if rule is None:
+            masks[code] = all_rows
+        elif rule['code'] not in columns_by_code:
+            if rule['code'] not in known_codes:
+                warnings.warn('The condition of {} refers to the unknown question {}, '
+                              'it is shown to everyone'.format(code, rule['code']))
+            unresolved.append((code, condition, 'unknown question {}'.format(rule['code'])))
+            masks[code] = all_rows
+        else:
+            mask = evaluate_rule(df, rule, columns_by_code[rule['code']])
+            masks[code] = mask & masks.get(rule['code'], all_rows)
+    masks = pd.DataFrame(masks, index=df.index)
+    unresolved = pd.DataFrame(unresolved, columns=['code', 'condition', 'reason'])
+    return masks, unresolved
+
+
+def get_eligible(masks, colnames, mapping):
+    """
+    Mask of the eligible respondents for some columns of the data
+
+    :params:
+        masks pd.df(): output of eligibility_masks()
+        colnames str() or list(): the column(s) of a question, a list of list is flattened
+        mapping dict(): output of questions.map_columns_to_codes()
+
+    :return:
+        pd.Series(): boolean mask, True for everyone if the columns are not linked to a question
+    """
+    if isinstance(colnames, str):
+        colnames = [colnames]
+    colnames = [c for col in colnames for c in (col if isinstance(col, list) else [col])]
+    eligible = pd.Series(True, index=masks.index)
+    for code in set(mapping.get(col) for col in colnames):
+        if code in masks.columns:
+            eligible &= masks[code]
+    return eligible
+
+
+def main():
+    """
+    """
+    from questions import load_questions, map_columns_to_codes, get_columns_by_code
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    questions = load_questions('../../../survey_creation/uk_17/uk_17.csv')
+    mapping = map_columns_to_codes(df.columns, questions)
+    masks, unresolved = eligibility_masks(df, questions, get_columns_by_code(mapping))
+    print(masks.sum().loc[lambda x: x < len(df)])
+    print(unresolved)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Consistency checks of the survey definitions of the different countries
+(survey_creation/XX_17/XX_17.csv and their listAnswers folders).
+Each survey is loaded once, the questions indexed by code and the catalogs
+by filename, and compared against a reference survey (the English one, uk_17)
+so that the columns of the different countries can be pooled:
+    - the codes are unique in each survey
+    - every answer_file exists in the listAnswers folder
+    - the translated catalogs have the same number of answers as the English ones
+    - the catalogs missing or added compared to the reference
+    - the questions missing or added compared to the reference
+"""
+
+import os
+import glob
+import pandas as pd
+
+from questions import load_questions
+from validation import load_catalogs
+
+
+def find_surveys(path_to_folder):
+    """
+    Find the surveys defined in a folder
+
+    :params:
+        path_to_folder str(): the survey_creation folder
+
+    :return:
+        dict(): name of the survey (uk_17) as key and its folder as value,
+        for the folders containing a csv with the same name
+    """
+    surveys = dict()
+    for filename in sorted(glob.glob(os.path.join(path_to_folder, '*', '*.csv'))):
+        folder = os.path.dirname(filename)
+        name = os.path.basename(folder)
+        if os.path.basename(filename) == name + '.csv':
+            surveys[name] = folder
+    return surveys
+
+
+def load_survey(path_to_folder):
+    """
+    Load the questions and the catalogs of a survey
+
+    :params:
+        path_to_folder str(): folder of the survey (survey_creation/uk_17)
+
+    :return:
+        dict(): with the keys 'questions' (pd.df()) and 'catalogs' (output of validation.load_catalogs())
+    """
+    name = os.path.basename(os.path.normpath(path_to_folder))
+    return {'questions': load_questions(os.path.join(path_to_folder, name + '.csv')),
+            'catalogs': load_catalogs(os.path.join(path_to_folder, 'listAnswers'))}
+
+
+def check_survey(survey, reference=None):
+    """
+    Check one survey, and compare it to the reference if given
+
+    :params:
+        survey dict(): output of load_survey()
+        reference dict(): output of load_survey() for the reference survey
+
+    :return:
+        list(): list of tuple (check, code, detail)
+    """
+    issues = list()
+    questions = survey['questions']
+    catalogs = survey['catalogs']
+
+    duplicated = questions.loc[questions['code'].duplicated(keep=False), 'code']
+    for code, count in duplicated.value_counts().items():
+        issues.append(('duplicated_code', code, '{} questions'.format(count)))
+
+    for code, answer_file in zip(questions['code'], questions['answer_file']):
+        if pd.notnull(answer_file) and answer_file not in catalogs:
+            issues.append(('missing_answer_file', code, answer_file))
+
+    if reference is None:
+        return issues
+
+    codes = pd.Index(questions['code'].unique())
+    ref_codes = pd.Index(reference['questions']['code'].unique())
+    for code in ref_codes[~ref_codes.isin(codes)]:
+        issues.append(('missing_question', code, None))
+    for code in codes[~codes.isin(ref_codes)]:
+        issues.append(('added_question', code, None))
+
+    for answer_file, catalog in sorted(catalogs.items()):
+        ref_catalog = reference['catalogs'].get(answer_file)
+        if ref_catalog is None:
+            issues.append(('added_catalog', None, answer_file))
+        elif len(catalog) != len(ref_catalog):
+            issues.append(('catalog_length', None, '{}: {} answers instead of {}'.format(
+                answer_file, len(catalog), len(ref_catalog))))
+    for answer_file in sorted(set(reference['catalogs']) - set(catalogs)):
+        issues.append(('missing_catalog', None, answer_file))
+    return issues
+
+
+def check_surveys(path_to_folder, reference='uk_17'):
+    """
+    Check all the surveys of a folder against the reference
+
+    :params:
+        path_to_folder str(): the survey_creation folder
+        reference str(): name of the reference survey
+
+    :return:
+        pd.df(): one row per issue with the columns 'survey', 'check', 'code' and 'detail'
+    """
+    folders = find_surveys(path_to_folder)
+    surveys = {name: load_survey(folder) for name, folder in folders.items()}
+    ref_survey = surveys.get(reference)
+    rows = list()
+    for name, survey in surveys.items():
+        compare_to = ref_survey if name != reference else None
+        for check, code, detail in check_survey(survey, compare_to):
+            rows.append((name, check, code, detail))
+    return pd.DataFrame(rows, columns=['survey', 'check', 'code', 'detail'])
+
+
+def main():
+    """
+    """
+    pd.set_option('display.max_rows', 300)
+    print(check_surveys('../../../survey_creation'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Analysis of the time spent by the respondents on the survey, from the
+'Question time' and 'Group time' columns of the limesurvey exports (in seconds)
+that dropping_lime_useless() removes from the cleaned data.
+The timings are loaded into a float32 matrix respondents x columns (NaN when
+the respondent did not see the question) and summarised with quantiles,
+which are not affected by the respondents leaving the survey open for hours.
+The speeders are detected with the relative speed index: the median, over the
+questions answered, of the ratio between the time of the respondent and the
+median time of the question. The drop-off funnel is computed from 'Last page'.
+"""
+
+import warnings
+import pandas as pd
+import numpy as np
+
+from raw_loader import read_header
+
+
+TIMING_PREFIXES = {'question': 'Question time', 'group': 'Group time'}
+
+
+def get_timing_columns(header, kind='question'):
+    """
+    Timing columns of an export
+
+    :params:
+        header list(): column names of the export
+        kind str(): 'question' or 'group'
+
+    :return:
+        list(): the column names
+    """
+    prefix = TIMING_PREFIXES[kind]
+    return [col for col in header if col.startswith(prefix)]
+
+
+def get_timing_name(colname):
+    """
+    Name of the question or group of a timing column
+    ('Question time: socio1' -> 'socio1')
+    """
+    for prefix in TIMING_PREFIXES.values():
+        if colname.startswith(prefix):
+            return colname[len(prefix):].lstrip(' :')
+    return colname
+
+
+def timing_matrix(df, colnames):
+    """
+    Convert the timing columns into a matrix
+
+    :params:
+        df pd.df(): dataframe containing the timing columns
+        colnames list(): the timing columns
+
+    :return:
+        dict(): with the keys 'names' (list of the questions or groups)
+        and 'values' (np.array of float32, respondents x names)
+    """
+    values = df[colnames].apply(pd.to_numeric, errors='coerce').values.astype(np.float32)
+    return {'names': [get_timing_name(col) for col in colnames], 'values': values}
+
+
+def load_timings(path_to_file, kind='question'):
+    """
+    Read only the timing columns and 'Last page' of a raw export
+
+    :params:
+        path_to_file str(): path to the export
+        kind str(): 'question' or 'group'
+
+    :return:
+        dict(): output of timing_matrix() with the key 'last_page' added
+        (np.array, NaN if the column is not in the export)
+    """
+    header = read_header(path_to_file)
+    colnames = get_timing_columns(header, kind)
+    usecols = colnames + (['Last page'] if 'Last page' in header else [])
+    df = pd.read_csv(path_to_file, usecols=usecols, dtype={col: np.float32 for col in colnames})
+    timings = timing_matrix(df, colnames)
+    if 'Last page' in df.columns:
+        timings['last_page'] = df['Last page'].values
+    else:
+        timings['last_page'] = np.full(len(df), np.nan)
+    return timings
+
+
+def latency_summary(timings, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+    """
+    Distribution of the time spent on each question or group
+
+    :params:
+        timings dict(): output of timing_matrix() or load_timings()
+        quantiles tuple(): the quantiles to compute
+
+    :return:
+        pd.df(): one row per question with the number of respondents 'n',
+        the quantiles, and the median absolute deviation 'mad'
+    """
+    values = timings['values']
+    # Empty columns give NaN and a warning, expected for the questions nobody saw
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q = np.nanquantile(values, quantiles, axis=0)
+        median = np.nanmedian(values, axis=0)
+        mad = np.nanmedian(np.abs(values - median), axis=0)
+    summary = pd.DataFrame(q.T, index=timings['names'], columns=['q{:g}'.format(x * 100) for x in quantiles])
+    summary.insert(0, 'n', np.count_nonzero(~np.isnan(values), axis=0))
+    summary['mad'] = mad
+    return summary
+
+
+def speed_index(timings, min_questions=5):
+    """
+    Relative speed index of each respondent: median of the ratio between
+    their time and the median time of each question. 1 is a typical
+    respondent, 0.5 twice faster
+
+    :params:
+        timings dict(): output of timing_matrix() or load_timings()
+        min_questions int(): the respondents with fewer timed questions get NaN
+
+    :return:
+        np.array(): the index of each respondent
+    """
+    values = timings['values']
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(values, axis=0)
+        with np.errstate(all='ignore'):
+            ratio = values / median
+        ratio[:, ~(median > 0)] = np.nan
+        index = np.nanmedian(ratio, axis=1)
+    index[np.count_nonzero(~np.isnan(ratio), axis=1) < min_questions] = np.nan
+    return index
+
+
+def detect_speeders(timings, threshold=0.5, min_questions=5):
+    """
+    Flag the respondents answering much faster than the others
+
+    :params:
+        timings dict(): output of timing_matrix() or load_timings()
+        threshold float(): respondents with a speed index below are speeders
+        min_questions int(): see speed_index()
+
+    :return:
+        pd.df(): with the columns 'speed_index' and 'speeder'
+    """
+    index = speed_index(timings, min_questions)
+    return pd.DataFrame({'speed_index': index, 'speeder': index < threshold})
+
+
+def dropoff_funnel(last_page, n_pages=None):
+    """
+    Number of respondents reaching each page of the survey
+
+    :params:
+        last_page array: the 'Last page' of each respondent, the missing values are skipped
+        n_pages int(): number of pages of the survey, the maximum of last_page if None
+
+    :return:
+        pd.df(): indexed by page with the columns 'reached', 'dropped' (the
+        respondents whose last page it is) and 'retention' (ratio of the
+        respondents reaching the page)
+    """
+    last_page = np.asarray(last_page, dtype=float)
+    last_page = last_page[~np.isnan(last_page)].astype(np.int64)
+    if n_pages is None:
+        n_pages = last_page.max() if len(last_page) else 0
+    dropped = np.bincount(last_page, minlength=n_pages + 1)
+    # Reached page p: last page >= p
+    reached = dropped[::-1].cumsum()[::-1]
+    funnel = pd.DataFrame({'reached': reached, 'dropped': dropped})
+    funnel.index.name = 'page'
+    funnel['retention'] = funnel['reached'] / float(max(len(last_page), 1))
+    return funnel
+
+
+def main():
+    """
+    """
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    print(dropoff_funnel(df['Last page']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validation of the exported answers against the catalogs of listAnswers
+declared in the `answer_file` column of the questions csv.
+The catalogs are read once into a pd.Index. For each column, only the distinct
+values are counted and tested with a single Index.isin(), so the cost depends
+on the number of distinct answers and not on the number of respondents.
+For the multiple choice questions (one Yes/No column per option), the option
+between brackets in the column name is tested instead of the values.
+"""
+
+import os
+import glob
+import pandas as pd
+
+from questions import RE_LAST_BRACKET
+
+
+# Answers added by limesurvey and not part of the catalogs
+EXTRA_VALUES = ('Other',)
+YES_NO = frozenset(['Yes', 'No'])
+
+
+def load_catalogs(path_to_folder):
+    """
+    Read all the catalogs of a listAnswers folder
+
+    :params:
+        path_to_folder str(): path to the folder
+
+    :return:
+        dict(): filename without extension as key and pd.Index() of the answers as value
+    """
+    catalogs = dict()
+    for filename in glob.glob(os.path.join(path_to_folder, '*.csv')):
+        file_key, _ = os.path.splitext(os.path.basename(filename))
+        with open(filename) as f:
+            # One answer per line, read whole as answers can contain commas and colons
+            lines = f.read().splitlines()
+        catalogs[file_key] = pd.Index([line.strip() for line in lines if line.strip()])
+    return catalogs
+
+
+def get_item(colname):
+    """
+    Option between brackets at the end of a column name, None if there is none
+    """
+    item = RE_LAST_BRACKET.search(colname)
+    if item is None:
+        return None
+    return item.group(0).strip()[1:-1].strip()
+
+
+def check_column(serie, catalog, extra_values=EXTRA_VALUES):
+    """
+    Off-catalog values of a column
+
+    :params:
+        serie pd.Series(): the column
+        catalog pd.Index(): the accepted answers
+        extra_values tuple(): answers accepted in addition to the catalog
+
+    :return:
+        pd.Series(): count of each off-catalog value, empty if all are valid
+    """
+    counts = serie.dropna().astype(str).str.strip().value_counts()
+    valid = counts.index.isin(catalog) | counts.index.isin(extra_values)
+    return counts[~valid]
+
+
+def validate_answers(df, questions, columns_by_code, catalogs, extra_values=EXTRA_VALUES):
+    """
+    Check all the columns having an answer_file against their catalog
+
+    :params:
+        df pd.df(): dataframe containing the data
+        questions pd.df(): output of questions.load_questions()
+        columns_by_code dict(): output of questions.get_columns_by_code()
+        catalogs dict(): output of load_catalogs()
+        extra_values tuple(): answers accepted in addition to the catalogs
+
+    :return:
+        pd.df(): one row per problem with the columns 'code', 'column',
+        'answer_file', 'kind' and 'value', 'count'. The kind is 'value' for an
+        off-catalog answer, 'option' for a multiple choice option not in the
+        catalog and 'missing_catalog' if the answer_file does not exist
+    """
+    rows = list()
+    for code, answer_file in zip(questions['code'], questions['answer_file']):
+        if pd.isnull(answer_file) or code not in columns_by_code:
+            continue
+        catalog = catalogs.get(answer_file)
+        if catalog is None:
+            rows.append((code, None, answer_file, 'missing_catalog', None, 0))
+            continue
+        for col in columns_by_code[code]:
+            item = get_item(col)
+            # The free text of the 'Other' field is not expected in the catalog
+            if item == 'Other':
+                continue
+            if item is not None and set(df[col].dropna().unique()) <= YES_NO:
+                if item not in catalog:
+                    rows.append((code, col, answer_file, 'option', item, int(df[col].eq('Yes').sum())))
+                continue
+            for value, count in check_column(df[col], catalog, extra_values).items():
+                rows.append((code, col, answer_file, 'value', value, int(count)))
+    return pd.DataFrame(rows, columns=['code', 'column', 'answer_file', 'kind', 'value', 'count'])
+
+
+def main():
+    """
+    """
+    from questions import load_questions, map_columns_to_codes, get_columns_by_code
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    questions = load_questions('../../../survey_creation/uk_17/uk_17.csv')
+    catalogs = load_catalogs('../../../survey_creation/uk_17/listAnswers')
+    columns_by_code = get_columns_by_code(map_columns_to_codes(df.columns, questions))
+    report = validate_answers(df, questions, columns_by_code, catalogs)
+    pd.set_option('display.max_rows', 300)
+    print(report[['code', 'kind', 'value', 'count']])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Weighting of the respondents by raking (iterative proportional fitting), so the
+distribution of some demographic questions (type of organisation, seniority, ...)
+matches known margins, for instance from the list of the people contacted.
+The columns are encoded once and each sweep adjusts the weights on one column
+after the other with a np.bincount() of the weights per answer, until all
+the weighted margins match the targets.
+The weights are normalised to a mean of 1, so the weighted counts stay in the
+same range as the unweighted ones, and can be passed to the aggregation
+functions through their `weights` parameter.
+
+Deming and Stephan, On a least squares adjustment of a sampled frequency
+table when the expected marginal totals are known, 1940
+"""
+
+import warnings
+import pandas as pd
+import numpy as np
+
+from encoding import encode_column
+
+
+def encode_targets(df, targets):
+    """
+    Encode the raking columns with the answers of the targets as categories
+
+    :params:
+        df pd.df(): dataframe containing the data
+        targets dict(): column as key and a dictionary {answer: target} as value.
+        The targets are proportions or counts, they are normalised
+
+    :return:
+        list(): list of tuple (codes, target proportions) per column. The answers
+        not in the targets and the missing values have the code -1
+    """
+    encoded = list()
+    for col, target in targets.items():
+        answers = list(target.keys())
+        codes, _ = encode_column(df[col], answers)
+        proportions = np.array([target[a] for a in answers], dtype=float)
+        encoded.append((codes, proportions / proportions.sum()))
+    return encoded
+
+
+def rake(df, targets, base_weights=None, max_iter=100, tol=1e-6, bounds=None):
+    """
+    Compute the raking weights
+
+    :params:
+        df pd.df(): dataframe containing the data
+        targets dict(): see encode_targets()
+        base_weights np.array(): initial weights, 1 for everyone if None
+        max_iter int(): maximum number of sweeps over the columns
+        tol float(): stop when all the weighted proportions are within tol of the targets
+        bounds tuple(): optional (min, max) of the weights relative to their mean,
+        applied after each sweep to avoid extreme weights (see trim_weights())
+
+    :return:
+        pd.Series(): the weight of each respondent, with a mean of 1. The respondents
+        without answer to a column are not adjusted on that column
+    :warn:
+        RuntimeWarning: if the margins are not within tol of the targets after max_iter sweeps
+    """
+    encoded = encode_targets(df, targets)
+    if base_weights is None:
+        weights = np.ones(len(df), dtype=float)
+    else:
+        weights = np.asarray(base_weights, dtype=float).copy()
+
+    for _ in range(max_iter):
+        for codes, proportions in encoded:
+            valid = codes >= 0
+            totals = np.bincount(codes[valid], weights=weights[valid], minlength=len(proportions))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                factors = np.where(totals > 0, proportions * totals.sum() / totals, 1.)
+            weights[valid] *= factors[codes[valid]]
+        if bounds is not None:
+            weights = trim_weights(weights, bounds)
+        if max_margin_error(encoded, weights) < tol:
+            break
+    else:
+        warnings.warn('Raking did not converge in {} sweeps, the largest margin error is {:.3g}'.format(
+            max_iter, max_margin_error(encoded, weights)), RuntimeWarning)
+    if bounds is None:
+        weights = weights / weights.mean()
+    return pd.Series(weights, index=df.index, name='weight')
+
+
+def trim_weights(weights, bounds, max_iter=100, tol=1e-9):
+    """
+    Normalise the weights to a mean of 1 and clip them to the bounds. Clipping
+    changes the mean, so both are repeated until the weights are stable and
+    the bounds hold on the returned weights
+
+    :params:
+        weights np.array(): the weights
+        bounds tuple(): (min, max) of the weights relative to their mean,
+        min should be below 1 and max above 1
+        max_iter int(): maximum number of repetitions
+        tol float(): stop when no weight changes by more than tol
+
+    :return:
+        np.array(): the weights within the bounds, with a mean of 1 (up to tol)
+    """
+    for _ in range(max_iter):
+        trimmed = np.clip(weights / weights.mean(), bounds[0], bounds[1])
+        if np.abs(trimmed - weights).max() < tol:
+            break
+        weights = trimmed
+    return trimmed
+
+
+def max_margin_error(encoded, weights):
+    """
+    Largest difference between a weighted proportion and its target
+    """
+    error = 0.
+    for codes, proportions in encoded:
+        valid = codes >= 0
+        totals = np.bincount(codes[valid], weights=weights[valid], minlength=len(proportions))
+        if totals.sum() > 0:
+            error = max(error, np.abs(totals / totals.sum() - proportions).max())
+    return error
+
+
+def margins_table(df, targets, weights):
+    """
+    Compare the unweighted and weighted proportions with the targets
+
+    :return:
+        pd.df(): indexed by (column, answer) with the columns
+        'unweighted', 'weighted' and 'target'
+    """
+    rows = list()
+    weights = np.asarray(weights, dtype=float)
+    for (codes, proportions), (col, target) in zip(encode_targets(df, targets), targets.items()):
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(proportions)).astype(float)
+        totals = np.bincount(codes[valid], weights=weights[valid], minlength=len(proportions))
+        for i, answer in enumerate(target.keys()):
+            rows.append((col, answer, counts[i] / counts.sum(), totals[i] / totals.sum(), proportions[i]))
+    output = pd.DataFrame(rows, columns=['column', 'answer', 'unweighted', 'weighted', 'target'])
+    return output.set_index(['column', 'answer'])
+
+
+def weighted_value_counts(serie, weights, dropna=False, normalize=False):
+    """
+    Same as pd.Series.value_counts() but summing the weights of the respondents
+    """
+    counts = weights.groupby(serie, dropna=dropna).sum()
+    if normalize:
+        counts = counts / counts.sum()
+    return counts.sort_values(ascending=False)
+
+
+def effective_sample_size(weights):
+    """
+    Kish effective sample size, (sum of the weights)^2 / sum of the squared weights
+    """
+    weights = np.asarray(weights, dtype=float)
+    return weights.sum() ** 2 / (weights ** 2).sum()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Word counts of the free-text questions (the 'messy_data' type).
+The answers are tokenised with a generator and each word (and each bigram)
+is hashed into a fixed number of buckets, so the counts of a question take the
+same memory whatever the size of the vocabulary. The first token seen in each
+bucket is kept to display the top terms. The questions are processed in
+parallel and the counts are kept per question and per country, and can be merged
+to get the counts over the pooled dataset.
+"""
+
+import os
+import re
+import zlib
+import concurrent.futures
+import pandas as pd
+import numpy as np
+
+
+# Letters and digits of any alphabet, with the inner + # ' . - of 'c++', 'c#', 'e.g'
+RE_TOKEN = re.compile(r"[^\W_][\w+#'.-]*[\w+#]|[^\W_]", re.UNICODE)
+
+STOPWORDS = frozenset(['a', 'about', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for',
+                       'from', 'i', 'in', 'is', 'it', 'my', 'of', 'on', 'or', 'that',
+                       'the', 'this', 'to', 'with', 'we', 'our', 'me', 'etc', 'e.g', 'eg'])
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    """
+    Generator of the lower case words of a text, without the stopwords.
+    The words are not limited to ascii: 'Universität Zürich' gives
+    'universität' and 'zürich'
+    """
+    for token in RE_TOKEN.findall(str(text).lower()):
+        if token not in stopwords:
+            yield token
+
+
+def bigrams(tokens):
+    """
+    Generator of the pairs of consecutive tokens joined by a space
+    """
+    previous = None
+    for token in tokens:
+        if previous is not None:
+            yield previous + ' ' + token
+        previous = token
+
+
+def hash_token(token, n_features):
+    # crc32 is stable between processes, unlike hash()
+    return zlib.crc32(token.encode('utf-8')) % n_features
+
+
+def create_counts(n_features=2 ** 16):
+    """
+    Create empty hashed counts
+
+    :params:
+        n_features int(): number of buckets
+
+    :return:
+        dict(): with the keys 'n_answers', 'unigrams' and 'bigrams' (np.array of counts)
+        and 'names' (bucket: first token seen) for each of them
+    """
+    return {'n_answers': 0,
+            'unigrams': np.zeros(n_features, dtype=np.int64),
+            'bigrams': np.zeros(n_features, dtype=np.int64),
+            'names': {'unigrams': dict(), 'bigrams': dict()}}
+
+
+def _flush(counts, buckets):
+    """
+    Add the buffered buckets to the counts and empty the buffers
+    """
+    n_features = len(counts['unigrams'])
+    for kind in buckets:
+        counts[kind] += np.bincount(np.array(buckets[kind], dtype=np.int64), minlength=n_features)
+        buckets[kind] = []
+
+
+def update_counts(counts, texts, buffer_size=100000):
+    """
+    Add the words of the texts to the counts
+
+    :params:
+        counts dict(): output of create_counts()
+        texts iterable: the answers, the missing values are skipped
+        buffer_size int(): number of buckets buffered before being added to the counts
+    """
+    n_features = len(counts['unigrams'])
+    buckets = {'unigrams': [], 'bigrams': []}
+    for text in texts:
+        if pd.isnull(text):
+            continue
+        counts['n_answers'] += 1
+        tokens = list(tokenize(text))
+        for kind, terms in (('unigrams', tokens), ('bigrams', bigrams(tokens))):
+            names = counts['names'][kind]
+            for term in terms:
+                bucket = hash_token(term, n_features)
+                buckets[kind].append(bucket)
+                if bucket not in names:
+                    names[bucket] = term
+        if len(buckets['unigrams']) >= buffer_size:
+            _flush(counts, buckets)
+    _flush(counts, buckets)
+    return counts
+
+
+def merge_counts(list_counts):
+    """
+    Sum several hashed counts with the same number of buckets
+    """
+    merged = create_counts(len(list_counts[0]['unigrams']))
+    for counts in list_counts:
+        merged['n_answers'] += counts['n_answers']
+        for kind in ['unigrams', 'bigrams']:
+            merged[kind] += counts[kind]
+            for bucket, name in counts['names'][kind].items():
+                merged['names'][kind].setdefault(bucket, name)
+    return merged
+
+
+def _count_question(args):
+    """
+    Count the words of one question for each group. Run in the worker processes
+    """
+    colname, values, groups, n_features = args
+    if groups is None:
+        split = [(None, values)]
+    else:
+        split = values.groupby(groups)
+    return {(colname, group): update_counts(create_counts(n_features), texts)
+            for group, texts in split}
+
+
+def word_count_pipeline(df, questions, groupby=None, n_features=2 ** 16, n_jobs=None):
+    """
+    Word counts of several free-text questions, per question and per group
+
+    :params:
+        df pd.df(): dataframe containing the data
+        questions list(): the free-text columns
+        groupby str(): optional column to split the respondents (the country)
+        n_features int(): number of buckets of the hashed counts
+        n_jobs int(): number of processes, all the cores if None (Default),
+        run in the current process if 1
+
+    :return:
+        dict(): (question, group) as key and the counts as value. The group is
+        None if groupby is None, the respondents without group are skipped otherwise
+    """
+    groups = df[groupby] if groupby is not None else None
+    tasks = [(q, df[q], groups, n_features) for q in questions]
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs == 1:
+        results = [_count_question(t) for t in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_count_question, tasks))
+    output = dict()
+    for res in results:
+        output.update(res)
+    return output
+
+
+def pool_counts(all_counts, question):
+    """
+    Merge the counts of all the groups for a question
+    """
+    return merge_counts([c for (q, _), c in all_counts.items() if q == question])
+
+
+def top_terms(counts, top=20, kind='unigrams'):
+    """
+    Most frequent terms of the counts. As the terms are hashed, a bucket
+    can hold several terms, it is then displayed with the first one seen
+
+    :params:
+        counts dict(): output of update_counts()
+        top int(): number of terms
+        kind str(): 'unigrams' or 'bigrams'
+
+    :return:
+        pd.Series(): the counts indexed by the terms
+    """
+    values = counts[kind]
+    top = min(top, np.count_nonzero(values))
+    best = np.argsort(-values, kind='mergesort')[:top]
+    return pd.Series(values[best], index=[counts['names'][kind][b] for b in best], name=kind)
+
+
+def main():
+    """
+    """
+    import json
+    df = pd.read_csv('../uk_2017/dataset/cleaned_data.csv')
+    with open('../uk_2017/to_plot.json', 'r') as f:
+        type_questions = json.load(f)
+    questions = [q for group in type_questions['single_questions']['messy_data'] for q in group]
+    all_counts = word_count_pipeline(df, questions)
+    for q in questions:
+        print(q)
+        print(top_terms(pool_counts(all_counts, q), top=5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cached reader for the xlsx workbooks kept in survey_creation/ (uk_16.xlsx,
+comparison.xlsx, canarie_17/canarie_17.xlsx).
+Parsing xlsx is slow, so each sheet is converted once into a columnar file
+(parquet if pyarrow is installed, pickle otherwise) stored in a cache folder.
+The cache files are keyed on the hash of the workbook, so any modification of
+the workbook invalidates the cache automatically.
+"""
+
+import os
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pkl'
+
+
+def hash_workbook(path_to_file, block_size=65536):
+    """
+    Compute the sha1 of a file, reading it by block to avoid loading
+    the whole file in memory
+
+    :params:
+        path_to_file str(): path to the workbook
+        block_size int(): size of the block read at each iteration
+
+    :return:
+        str(): the hexadecimal digest of the file
+    """
+    sha = hashlib.sha1()
+    with open(path_to_file, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_cache_location(path_to_file, cache_folder=None):
+    """
+    Return the folder where the cached sheets of a workbook are stored.
+    By default it is a `.cache` folder next to the workbook
+
+    :params:
+        path_to_file str(): path to the workbook
+        cache_folder str(): folder to use instead of the default one
+
+    :return:
+        str(): path to the cache folder
+    """
+    if cache_folder is None:
+        cache_folder = os.path.join(os.path.dirname(os.path.abspath(path_to_file)), '.cache')
+    return cache_folder
+
+
+def _cache_filename(cache_folder, path_to_file, digest, sheet_name):
+    """
+    Build the name of the cached file for one sheet. The workbook name is
+    kept in the filename to be able to find it by eye in the folder
+    """
+    workbook, _ = os.path.splitext(os.path.basename(path_to_file))
+    sheet = str(sheet_name).replace(os.sep, '_')
+    return os.path.join(cache_folder, '{}_{}_{}.{}'.format(workbook, digest, sheet, CACHE_FORMAT))
+
+
+def _write_cache(df, filename):
+    if CACHE_FORMAT == 'parquet':
+        df.to_parquet(filename)
+    else:
+        df.to_pickle(filename)
+
+
+def _read_cache(filename):
+    if CACHE_FORMAT == 'parquet':
+        return pd.read_parquet(filename)
+    return pd.read_pickle(filename)
+
+
+def _index_filename(cache_folder, path_to_file, digest):
+    """
+    File listing the sheet names of a workbook, to avoid opening the
+    workbook only to know which sheets it contains
+    """
+    workbook, _ = os.path.splitext(os.path.basename(path_to_file))
+    return os.path.join(cache_folder, '{}_{}.sheets'.format(workbook, digest))
+
+
+def _resolve_sheet(sheet_names, sheet_name):
+    """
+    Name of the sheet asked, by name or by position as in pd.read_excel()
+
+    :raise:
+        ValueError: if the workbook has no such sheet
+    """
+    sheet_names = [str(s) for s in sheet_names]
+    if isinstance(sheet_name, int) and not isinstance(sheet_name, bool):
+        if -len(sheet_names) <= sheet_name < len(sheet_names):
+            return sheet_names[sheet_name]
+        raise ValueError('Worksheet index {} is invalid, {} worksheets found: {}'.format(
+            sheet_name, len(sheet_names), sheet_names))
+    if str(sheet_name) not in sheet_names:
+        raise ValueError('Worksheet named {!r} not found, the sheets are: {}'.format(sheet_name, sheet_names))
+    return str(sheet_name)
+
+
+def cache_workbook(path_to_file, cache_folder=None, digest=None):
+    """
+    Parse all the sheets of the workbook once and write each of them
+    in the cache folder
+
+    :params:
+        path_to_file str(): path to the workbook
+        cache_folder str(): folder where to write the cache. See get_cache_location()
+        digest str(): hash of the workbook if already computed
+
+    :return:
+        dict(): sheet names as keys and the dataframes as values
+    """
+    cache_folder = get_cache_location(path_to_file, cache_folder)
+    if digest is None:
+        digest = hash_workbook(path_to_file)
+    os.makedirs(cache_folder, exist_ok=True)
+
+    sheets = pd.read_excel(path_to_file, sheet_name=None)
+    for sheet_name, df in sheets.items():
+        _write_cache(df, _cache_filename(cache_folder, path_to_file, digest, sheet_name))
+    # The index is written last, so an interrupted run does not leave
+    # an index pointing to missing sheets
+    with open(_index_filename(cache_folder, path_to_file, digest), 'w') as f:
+        f.write('\n'.join(str(s) for s in sheets))
+    return sheets
+
+
+def read_excel_cached(path_to_file, sheet_name=None, cache_folder=None):
+    """
+    Read a workbook from the cache if it exists for the current version
+    of the file, otherwise parse it and create the cache.
+
+    :params:
+        path_to_file str(): path to the workbook
+        sheet_name str() or int(): name or position (from 0) of the sheet to return.
+        If None (Default), return all the sheets in a dictionary, as
+        pd.read_excel(sheet_name=None) does
+        cache_folder str(): folder where the cache is stored. See get_cache_location()
+
+    :return:
+        pd.df() if sheet_name is given, dict() of pd.df() otherwise
+    :raise:
+        ValueError: if the workbook has no such sheet
+    """
+    cache_folder = get_cache_location(path_to_file, cache_folder)
+    digest = hash_workbook(path_to_file)
+    index_file = _index_filename(cache_folder, path_to_file, digest)
+
+    if os.path.isfile(index_file):
+        with open(index_file) as f:
+            sheet_names = f.read().split('\n')
+        if sheet_name is not None:
+            sheet_name = _resolve_sheet(sheet_names, sheet_name)
+            return _read_cache(_cache_filename(cache_folder, path_to_file, digest, sheet_name))
+        return {s: _read_cache(_cache_filename(cache_folder, path_to_file, digest, s))
+                for s in sheet_names}
+
+    sheets = cache_workbook(path_to_file, cache_folder, digest)
+    if sheet_name is not None:
+        sheet_name = _resolve_sheet(sheets, sheet_name)
+        return {str(s): df for s, df in sheets.items()}[sheet_name]
+    return sheets
+
+
+def clear_cache(path_to_file, cache_folder=None, keep_current=True):
+    """
+    Remove the cached files of a workbook. By default, only the files
+    from the previous versions of the workbook are removed
+
+    :params:
+        path_to_file str(): path to the workbook
+        cache_folder str(): folder where the cache is stored
+        keep_current bool(): keep the cache of the current version of the workbook
+
+    :return:
+        list(): the removed files
+    """
+    cache_folder = get_cache_location(path_to_file, cache_folder)
+    if not os.path.isdir(cache_folder):
+        return []
+    workbook, _ = os.path.splitext(os.path.basename(path_to_file))
+    current = hash_workbook(path_to_file) if keep_current else None
+    removed = list()
+    for filename in os.listdir(cache_folder):
+        if not filename.startswith(workbook + '_'):
+            continue
+        if current and filename.startswith('{}_{}'.format(workbook, current)):
+            continue
+        os.remove(os.path.join(cache_folder, filename))
+        removed.append(filename)
+    return removed
+
+
+def join_question_codes(df, questions, left_on='Question no.', right_on='code', how='left'):
+    """
+    Join a sheet from a legacy workbook (such as uk_16.xlsx or comparison.xlsx)
+    to the question definitions of a 2017 survey (the csv in survey_creation/XX_17/)
+    on the question code
+
+    :params:
+        df pd.df(): the sheet from the workbook
+        questions pd.df(): the 2017 questions, loaded from the csv file
+        left_on str(): column holding the question code in the sheet
+        right_on str(): column holding the question code in the questions file
+        how str(): type of join, passed to pd.merge()
+
+    :return:
+        pd.df(): the merged dataframe
+    """
+    df = df.loc[df[left_on].notnull()].copy()
+    # Some codes in the workbooks have trailing spaces
+    df[left_on] = df[left_on].astype(str).str.strip()
+    return pd.merge(df, questions, left_on=left_on, right_on=right_on,
+                    how=how, suffixes=('_2016', '_2017'))
+
+
+def main():
+    """
+    """
+    survey_folder = '../../../survey_creation'
+    uk_16 = read_excel_cached(os.path.join(survey_folder, 'uk_16.xlsx'), 'Sheet1')
+    questions_17 = pd.read_csv(os.path.join(survey_folder, 'uk_17', 'uk_17.csv'))
+    print(join_question_codes(uk_16, questions_17)[['Question no.', 'Question', 'question']])
+
+
+if __name__ == "__main__":
+    main()
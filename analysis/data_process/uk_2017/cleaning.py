@@ -10,6 +10,11 @@ import pandas as pd
 import numpy as np
 
 
+# Patterns used to clean the headers, compiled once
+RE_HEADER_SPACES = re.compile('[\xa0\t]')
+RE_HEADER_REPEATED_SPACES = re.compile(r'(?<=\s) +|^ +(?=\s)| (?= +[\n\0])')
+
+
 def get_answer_item(path_to_file):
     """
     Parse all the files contained in the folder and
@@ -62,11 +67,9 @@ def cleaning_columns_white_space(df):
     :return:
         df dataframe(): the same df but with cleaned columns
     """
-    # Some columns have a unbreakable space in their name, replace it
-    df.columns = df.columns.str.replace('\xa0', ' ')
-    # Some columns have a tabular instead of a space
-    df.columns = df.columns.str.replace('\t', ' ')
-    df = df.rename(columns=lambda x: re.sub('(?<=\s) +|^ +(?=\s)| (?= +[\n\0])', ' ', x))
+    # Some columns have a unbreakable space or a tabular instead of a space
+    df.columns = df.columns.str.replace(RE_HEADER_SPACES, ' ', regex=True)
+    df.columns = df.columns.str.replace(RE_HEADER_REPEATED_SPACES, ' ', regex=True)
     # Replace all ending white space
     df.columns = df.columns.str.strip()
     return df
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import sys
 import json
 import pandas as pd
 import numpy as np
@@ -14,6 +16,9 @@ matplotlib.use('TkAgg')
 
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'include'))
+from weighting import weighted_value_counts  # noqa: E402
+
 
 def get_type_question(input_location):
     """
@@ -22,17 +27,47 @@ def get_type_question(input_location):
         return json.load(f)
 
 
-def freq_table(df, colnames=False, columns='count', add_ratio=False, sort_order=False):
+def freq_table(df, colnames=False, columns='count', add_ratio=False, sort_order=False, eligible=None,
+               weights=None):
     """
+    :params:
+        eligible pd.Series(): boolean mask of the respondents shown the question
+        (see include/skip_logic.py). If given, only these respondents are counted
+        and the ratio is computed over all of them, answered or not
+        weights pd.Series(): weight of each respondent (see include/weighting.py),
+        the counts are then the sum of the weights
     """
+    if weights is not None:
+        weights = pd.Series(np.asarray(weights, dtype=float), index=df.index)
+    if eligible is not None:
+        df = df.loc[eligible]
+        if weights is not None:
+            weights = weights.loc[eligible]
     if colnames:
         df_to_freq = df[colnames]
     else:
         df_to_freq = df
-    if add_ratio:
-        output = pd.concat([pd.crosstab(df_to_freq, columns='count', normalize=False),
-                            pd.crosstab(df_to_freq, columns='ratio', normalize=True)],
-                           axis=1)
+    if weights is not None:
+        if isinstance(df_to_freq, pd.DataFrame):
+            # crosstab() takes the columns as a list and only counts the rows answering all of them
+            index = [df_to_freq[col] for col in df_to_freq.columns]
+            answered = df_to_freq.notnull().all(axis=1)
+        else:
+            index = df_to_freq
+            answered = df_to_freq.notnull()
+        output = pd.crosstab(index, colnames=[''], columns='count' if add_ratio else columns,
+                             values=weights, aggfunc='sum')
+        if add_ratio:
+            # Same denominators as without weights: the eligible or the answering respondents
+            total = weights.sum() if eligible is not None else weights[answered].sum()
+            output['ratio'] = output['count'] / float(total)
+    elif add_ratio:
+        count = pd.crosstab(df_to_freq, columns='count', normalize=False)
+        if eligible is not None:
+            ratio = (count / float(len(df))).rename(columns={'count': 'ratio'})
+        else:
+            ratio = pd.crosstab(df_to_freq, columns='ratio', normalize=True)
+        output = pd.concat([count, ratio], axis=1)
     else:
         output = pd.crosstab(df_to_freq, colnames=[''], columns=columns)
     if sort_order:
@@ -80,24 +115,38 @@ def freq_plotting(df, colnames='count', sort_order=False, stacked=False, horizon
 #     return d
 
 
-def count_unique_value(df, colnames, rename_columns=False, dropna=False, normalize=False):
+def count_unique_value(df, colnames, rename_columns=False, dropna=False, normalize=False, eligible=None,
+                       weights=None):
     """
     Count the values of different columns and transpose the count
     :params:
         :df pd.df(): dataframe containing the data
         :colnames list(): list of strings corresponding to the column header to select the right column
+        :eligible pd.Series(): boolean mask of the respondents shown the question,
+        the others are not counted (their NaN are not part of the denominator)
+        :weights pd.Series(): weight of each respondent (see include/weighting.py),
+        the counts are then the sum of the weights
     :return:
         :result_df pd.df(): dataframe with the count of each answer for each columns
     """
     # Subset the columns
     colnames = [i for j in colnames for i in j]
+    if weights is not None:
+        weights = pd.Series(np.asarray(weights, dtype=float), index=df.index)
+    if eligible is not None:
+        df = df.loc[eligible]
+        if weights is not None:
+            weights = weights.loc[eligible]
     df_sub = df[colnames]
 
     if rename_columns is True:
         df_sub.columns = [s.split('[', 1)[1].split(']')[0] for s in colnames]
 
     # Calculate the counts for them
-    df_sub = df_sub.apply(pd.Series.value_counts, dropna=dropna, normalize=normalize)
+    if weights is not None:
+        df_sub = df_sub.apply(weighted_value_counts, weights=weights, dropna=dropna, normalize=normalize)
+    else:
+        df_sub = df_sub.apply(pd.Series.value_counts, dropna=dropna, normalize=normalize)
     # Transpose the column to row to be able to plot a stacked bar chart
     return df_sub.transpose()
 